@@ -0,0 +1,136 @@
+"""自管的 ffmpeg 解码层：媒体文件 → 16 kHz 单声道 float32 PCM。
+
+whisper / mlx_whisper 的 load_audio 用 `subprocess.run(...).stdout` 把整段 s16le
+读成一个大 bytes，再 frombuffer → astype(float32) / 32768，峰值内存是音频的两到
+三份。这里改为：
+
+- 先用 `ffmpeg -i` 探测时长，按时长一次性预分配 float32 缓冲（未知时按需倍增）；
+- 从 ffmpeg 的 stdout 以固定大小的块 readinto 复用的 bytearray，逐块换算写入
+  缓冲（int16 → float32 无中间数组）；
+- 超长输入（默认 > 3 小时）改用匿名临时文件上的 np.memmap，常驻内存只剩页缓存。
+
+返回的数组可直接交给后端 transcribe，也可被 VAD / 切块复用，整条流水线只解码一次。
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_BLOCK_BYTES = 1 << 20              # 每次从管道读取 1 MiB（偶数，恰为整数个 int16）
+_MMAP_SECONDS = 3 * 3600            # 预计时长超过此值时使用 memmap 缓冲
+_UNKNOWN_SECONDS = 600              # 时长未知时的初始容量
+_SCALE = np.float32(1.0 / 32768.0)
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d{2}):(\d{2}(?:\.\d+)?)')
+
+
+def _ffmpeg_exe(ffmpeg):
+    return ffmpeg or shutil.which('ffmpeg') or 'ffmpeg'
+
+
+def probe_duration(path, ffmpeg=None):
+    """用 `ffmpeg -i` 读取容器时长（秒）；无法得知时返回 None。"""
+    try:
+        r = subprocess.run([_ffmpeg_exe(ffmpeg), '-hide_banner', '-nostdin', '-i', path],
+                           capture_output=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    m = _DURATION_RE.search(r.stderr.decode('utf-8', errors='replace'))
+    if not m:
+        return None
+    h, mi, s = m.groups()
+    return int(h) * 3600 + int(mi) * 60 + float(s)
+
+
+class _Buffer:
+    """可增长的 float32 输出缓冲：内存数组，或匿名临时文件上的 memmap。"""
+
+    def __init__(self, capacity, use_mmap):
+        self.file = None
+        self.capacity = 0
+        self.array = None
+        if use_mmap:
+            self.file = tempfile.TemporaryFile(prefix='srtgen-pcm-')
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        if self.file is not None:
+            self.file.truncate(capacity * 4)
+            self.array = np.memmap(self.file, dtype=np.float32, mode='r+', shape=(capacity,))
+        else:
+            grown = np.empty(capacity, dtype=np.float32)
+            if self.array is not None:
+                grown[:self.capacity] = self.array[:self.capacity]
+            self.array = grown
+        self.capacity = capacity
+
+    def reserve(self, needed):
+        if needed > self.capacity:
+            self._allocate(max(needed, self.capacity * 2))
+
+    def result(self, length):
+        view = self.array[:length]
+        if self.file is None and length < self.capacity * 3 // 4:
+            view = view.copy()  # 时长估计偏大太多时收缩，释放多余容量
+        return view
+
+
+def _drain(stream, sink):
+    """后台读空 stderr（防止管道写满阻塞 ffmpeg），只保留末尾用于报错。"""
+    tail = b''
+    for chunk in iter(lambda: stream.read(4096), b''):
+        tail = (tail + chunk)[-4096:]
+    sink.append(tail)
+
+
+def load_audio(path, sr=SAMPLE_RATE, ffmpeg=None, mmap_seconds=_MMAP_SECONDS):
+    """流式解码 path 为 float32 PCM（[-1, 1)），返回一维 ndarray（或 np.memmap）。
+
+    ffmpeg 为可执行文件路径（通常取 transcriber.setup_ffmpeg 的结果），None 时查 PATH。
+    解码失败抛出 RuntimeError（附 ffmpeg 的错误输出末尾）。
+    """
+    exe = _ffmpeg_exe(ffmpeg)
+    duration = probe_duration(path, exe)
+    est = int((duration + 1.0) * sr) if duration else _UNKNOWN_SECONDS * sr
+    buf = _Buffer(est, use_mmap=bool(duration) and duration > mmap_seconds)
+
+    cmd = [exe, '-nostdin', '-hide_banner', '-loglevel', 'error', '-threads', '0',
+           '-i', path, '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    err_tail = []
+    drainer = threading.Thread(target=_drain, args=(proc.stderr, err_tail), daemon=True)
+    drainer.start()
+
+    block = bytearray(_BLOCK_BYTES)
+    view = memoryview(block)
+    pos = 0          # 已写入的采样数
+    carry = 0        # 上次读到的奇数字节（半个采样）留在 block[0]
+    try:
+        while True:
+            n = proc.stdout.readinto(view[carry:])
+            if not n:
+                break
+            n += carry
+            count = n // 2
+            if count:
+                buf.reserve(pos + count)
+                samples = np.frombuffer(block, dtype=np.int16, count=count)
+                np.multiply(samples, _SCALE, out=buf.array[pos:pos + count], dtype=np.float32)
+                pos += count
+            carry = n - count * 2
+            if carry:
+                block[0] = block[n - 1]
+    finally:
+        proc.stdout.close()
+        code = proc.wait()
+        drainer.join(timeout=5)
+
+    if code != 0:
+        msg = (err_tail[0] if err_tail else b'').decode('utf-8', errors='replace').strip()
+        raise RuntimeError(f'ffmpeg 解码失败（返回码 {code}）：{msg or os.path.basename(path)}')
+    return buf.result(pos)
@@ -0,0 +1,257 @@
+"""无界面批量转录（不导入 PyQt5）。
+
+适合渲染节点 / 调度器批量驱动：
+
+    python batch_cli.py /data/videos                     # 递归目录
+    python batch_cli.py "/data/**/*.mp4" a.wav --itt      # glob（请加引号交给本程序展开）
+    python batch_cli.py /data --model small --language en --manifest run.jsonl
+    python batch_cli.py /data --device cpu --workers 8    # 8 个进程并行转录（CPU）
+    python batch_cli.py talk.mp3 --device cpu --workers 8 --chunk-seconds 300   # 长文件切块并行
+    python batch_cli.py samples/ --benchmark cpu,quantized   # 对比 fp32 与 int8 的速度与差异
+
+目录与 glob 会递归展开并按 SUPPORTED_EXTENSIONS 过滤；显式给出的单个文件原样
+处理（格式不支持时在结果中报错）。--manifest 按完成顺序逐行写入 JSONL，每行含
+输入路径、输出、错误信息与解码/转录/写出耗时，崩溃中断时已完成部分仍可读。
+
+--benchmark 只转录不写出：按给定设备依次转录同一批文件（解码只做一次），报告各设备
+的模型加载耗时、转录耗时与实时倍率，并以第一个设备的结果为参照给出词错误率
+（中日韩文字按字计算）。
+
+退出码：0 全部成功，1 有文件失败，2 引擎加载失败或无可处理文件。
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from pathlib import Path
+
+import subtitles
+import transcriber
+from model_cache import device_kind
+from result_cache import ResultCache
+from transcriber import SUPPORTED_EXTENSIONS, MODELS, Transcriber
+
+
+def _walk(directory, recursive):
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in SUPPORTED_EXTENSIONS:
+                found.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return found
+
+
+def collect_inputs(inputs, recursive=True):
+    """把目录 / glob / 文件参数展开为去重且保序的媒体文件列表。"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(_walk(item, recursive))
+        elif glob.has_magic(item):
+            for match in sorted(glob.glob(item, recursive=recursive)):
+                if os.path.isdir(match):
+                    paths.extend(_walk(match, recursive))
+                elif Path(match).suffix.lower() in SUPPORTED_EXTENSIONS:
+                    paths.append(match)
+        else:
+            paths.append(item)
+    seen = set()
+    unique = []
+    for p in paths:
+        key = os.path.abspath(p)
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def _tokens(text):
+    """词错误率的计算单位：含中日韩文字时按字，否则按空白分词。"""
+    if any('\u3040' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af' for ch in text):
+        return [ch for ch in text if not ch.isspace()]
+    return text.lower().split()
+
+
+def error_rate(reference, hypothesis):
+    """hypothesis 相对 reference 的词（字）错误率：编辑距离 / 参照长度。"""
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
+
+
+def benchmark(files, devices, args, language, status):
+    """按设备依次转录同一批已解码的音频，打印速度与相对第一个设备的错误率。"""
+    _apple, backend = transcriber.import_backend()
+    decoded = []
+    for path in files:
+        audio, _, err, _ = transcriber.decode_input(path, use_vad=args.vad)
+        if err is not None:
+            print(f'跳过 {path}：{err}', file=sys.stderr)
+        else:
+            decoded.append((path, audio))
+    if not decoded:
+        return 1
+    audio_s = sum(len(a) for _, a in decoded) / transcriber.SAMPLE_RATE
+    reference = None
+    print(f'{"设备":<12}{"加载(s)":>10}{"转录(s)":>10}{"实时倍率":>10}{"错误率":>10}')
+    for device in devices:
+        engine = Transcriber(args.model, device, language, args.task, False,
+                             endpoint=args.endpoint, on_status=status)
+        load_s = engine.load_model(backend)     # 加载单独计时，不算进任何一个文件
+        texts, elapsed = [], 0.0
+        for _, audio in decoded:
+            t0 = time.perf_counter()
+            res = engine.transcribe(audio, backend)
+            elapsed += time.perf_counter() - t0
+            texts.append(' '.join(s['text'].strip() for s in res['segments']))
+        text = '\n'.join(texts)
+        if reference is None:
+            reference = text
+        rate = error_rate(reference, text)
+        print(f'{device:<12}{load_s:>10.1f}{elapsed:>10.1f}'
+              f'{audio_s / max(elapsed, 1e-9):>9.1f}x{rate:>10.2%}', flush=True)
+    return 0
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(
+        description='无界面批量生成字幕（Whisper）。',
+        epilog=f'支持的扩展名：{" ".join(sorted(SUPPORTED_EXTENSIONS))}')
+    ap.add_argument('inputs', nargs='+', help='媒体文件、目录或 glob 模式')
+    ap.add_argument('--model', default=MODELS[0][0], choices=[m[0] for m in MODELS],
+                    help='模型（默认 %(default)s）')
+    ap.add_argument('--language', default='auto',
+                    help='语言码（zh / en / ja ...），auto 为自动检测（默认）')
+    ap.add_argument('--task', default='transcribe', choices=['transcribe', 'translate'])
+    ap.add_argument('--device', default='auto',
+                    choices=['auto', 'cpu', 'cuda', 'mlx', transcriber.QUANTIZED],
+                    help='auto：Apple Silicon 用 mlx，其余有 CUDA 用 cuda 否则 cpu；'
+                         'quantized 为 CPU int8 动态量化（更快，准确度略降）')
+    ap.add_argument('--itt', action='store_true', help='同时导出 Apple .itt')
+    ap.add_argument('--formats', default='',
+                    help='另外导出的格式，逗号分隔：' + ','.join(
+                        f for f in subtitles.FORMATS if f not in ('srt', 'itt'))
+                    + '（如 vtt,json）')
+    ap.add_argument('--endpoint', default=None,
+                    help='HF 下载端点（Apple Silicon），如 https://hf-mirror.com；'
+                         'auto 为测速选择最快的端点')
+    ap.add_argument('--model-budget-mb', type=int, default=None,
+                    help='常驻模型的内存 / 显存预算（MB），超出时淘汰最久未用的模型')
+    ap.add_argument('--manifest', default=None, help='逐文件结果与耗时写入该 JSONL 文件')
+    ap.add_argument('--no-recursive', dest='recursive', action='store_false',
+                    help='目录与 glob 不递归子目录')
+    ap.add_argument('--prefetch', type=int, default=transcriber._PREFETCH_FILES,
+                    help='解码预取文件数（默认 %(default)s）')
+    ap.add_argument('--workers', type=int, default=1,
+                    help='CPU 多进程转录的进程数（仅 openai-whisper + cpu / quantized 生效；'
+                         '默认 1）')
+    ap.add_argument('--chunk-seconds', type=float, default=None,
+                    help='配合 --workers：把长文件切成约此秒数的块并行转录（如 300）')
+    ap.add_argument('--batch-size', type=int, default=1,
+                    help='不超过 30 秒的短音频每批一起解码的文件数（openai-whisper；'
+                         f'如 {transcriber._BATCH_FILES}）。批量为贪心解码，结果可能与逐个'
+                         '转录略有差异；默认 1（逐个转录）')
+    ap.add_argument('--vad', action='store_true',
+                    help='推理前用语音活动检测跳过静音 / 纯音乐段')
+    ap.add_argument('--no-cache', dest='cache', action='store_false',
+                    help='不读写转录结果缓存（~/.cache/srtgen/results）')
+    ap.add_argument('--cache-max-mb', type=int, default=256,
+                    help='结果缓存容量上限（MB，超出按最近使用淘汰；默认 %(default)s）')
+    ap.add_argument('--benchmark', metavar='DEVICES', default=None,
+                    help='逗号分隔的设备列表（如 cpu,quantized）：只转录不写出，'
+                         '对比各设备的耗时与词错误率（以第一个为参照）')
+    ap.add_argument('-q', '--quiet', action='store_true', help='不打印进度，只打印逐文件结果')
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = collect_inputs(args.inputs, recursive=args.recursive)
+    if not files:
+        print('没有找到可处理的媒体文件', file=sys.stderr)
+        return 2
+
+    transcriber.setup_ffmpeg()
+    if not transcriber.have_ffmpeg():
+        print('错误：未找到 ffmpeg', file=sys.stderr)
+        return 2
+    device = transcriber.default_device() if args.device == 'auto' else args.device
+    language = None if args.language in ('', 'auto') else args.language
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in subtitles.FORMATS]
+    if unknown:
+        print(f'错误：不支持的格式：{",".join(unknown)}', file=sys.stderr)
+        return 2
+    if args.model_budget_mb is not None:
+        transcriber.MODEL_CACHE.set_budget(device_kind(device), args.model_budget_mb << 20)
+
+    status = (lambda _m: None) if args.quiet else (
+        lambda m: print(f'[status] {m}', file=sys.stderr, flush=True))
+    if args.benchmark:
+        devices = [d.strip() for d in args.benchmark.split(',') if d.strip()]
+        try:
+            return benchmark(files, devices, args, language, status)
+        except Exception as e:  # noqa: BLE001 - 引擎级错误（后端导入失败等）
+            print(f'错误：基准测试失败：{e}', file=sys.stderr)
+            return 2
+
+    manifest = open(args.manifest, 'a', encoding='utf-8') if args.manifest else None
+    total = len(files)
+    finished = [0]
+
+    def on_file_done(record):
+        finished[0] += 1
+        if record['error'] is None:
+            print(f'[{finished[0]}/{total}] OK   {record["path"]} -> {record["srt"]}', flush=True)
+        else:
+            print(f'[{finished[0]}/{total}] FAIL {record["path"]}: {record["error"]}',
+                  file=sys.stderr, flush=True)
+        if manifest:
+            record = dict(record, model=args.model, task=args.task, device=device)
+            manifest.write(json.dumps(record, ensure_ascii=False) + '\n')
+            manifest.flush()
+
+    engine = Transcriber(
+        args.model, device, language, args.task, args.itt, endpoint=args.endpoint,
+        prefetch=args.prefetch, workers=args.workers,
+        chunk_seconds=args.chunk_seconds, use_vad=args.vad, batch_size=args.batch_size,
+        formats=formats,
+        cache=ResultCache(max_bytes=args.cache_max_mb << 20) if args.cache else None,
+        on_status=status, on_file_done=on_file_done)
+
+    t0 = time.perf_counter()
+    try:
+        results = engine.run(files)
+    except Exception as e:  # noqa: BLE001 - 引擎级错误（后端导入失败等）
+        print(f'错误：加载转录引擎失败：{e}', file=sys.stderr)
+        return 2
+    finally:
+        if manifest:
+            manifest.close()
+
+    failed = sum(1 for r in results if r[2] is not None)
+    print(f'完成：成功 {len(results) - failed} 个，失败 {failed} 个，'
+          f'用时 {time.perf_counter() - t0:.1f}s', file=sys.stderr)
+    stats = transcriber.MODEL_CACHE.stats()
+    if not args.quiet and stats['misses']:
+        print(f'模型缓存：命中 {stats["hits"]}，加载 {stats["misses"]} 次'
+              f'（共 {stats["load_s"]:.1f}s），淘汰 {stats["evictions"]}', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
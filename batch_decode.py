@@ -0,0 +1,115 @@
+"""跨文件批量解码（openai-whisper）。
+
+whisper 每次前向只处理一个文件的一个 30 秒 mel 窗口；几百个短视频 / 语音备忘录
+逐个转录时，单次调用的固定开销与吃不满的矩阵乘占了大头。这里把多个不超过一个
+窗口的短音频的 mel 叠成一个批张量，编码器与解码器一次跑完整批（whisper.decode
+原生支持批量与逐条语言检测），再按 transcribe 的规则把每条结果的时间戳 token
+切成分段，拆回各文件的 whisper 风格 result dict。
+
+与 transcribe 的差异只在温度回退：批内一律贪心解码（温度 0，同 transcribe 的
+首选），压缩比或平均对数概率不达标的条目返回 None，由调用方对该文件改走完整的
+model.transcribe。超过一个窗口的长文件不入批（跨窗口依赖上一窗口的文本与
+时间戳推进，无法与其他文件并排）。
+"""
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE       # 与 whisper.audio.N_SAMPLES 一致
+_TIME_PRECISION = 0.02                  # 每个时间戳 token 的秒数
+
+# 与 transcribe 的默认阈值一致
+_MAX_COMPRESSION = 2.4
+_MIN_LOGPROB = -1.0
+_NO_SPEECH = 0.6
+
+
+def fits(audio, duration=None):
+    """audio（16 kHz PCM）能否放进一个窗口、参与批量解码。
+
+    duration 为原始音频的秒数：VAD 压缩后变短的长文件（语音少）不算短音频，不入批。
+    """
+    if duration is not None and duration > WINDOW_SAMPLES / SAMPLE_RATE:
+        return False
+    return audio is not None and 0 < len(audio) <= WINDOW_SAMPLES
+
+
+def _segments(tokens, tokenizer, duration, meta):
+    """按 transcribe 的规则把一个窗口的 token 序列切成分段。"""
+    begin = tokenizer.timestamp_begin
+    is_ts = [t >= begin for t in tokens]
+    cuts = [i + 1 for i in range(len(tokens) - 1) if is_ts[i] and is_ts[i + 1]]
+    spans = []
+    if cuts:
+        if is_ts[-2:] == [False, True]:     # 以单个时间戳结尾：最后一段到末尾
+            cuts.append(len(tokens))
+        last = 0
+        for cut in cuts:
+            part = tokens[last:cut]
+            spans.append(((part[0] - begin) * _TIME_PRECISION,
+                          (part[-1] - begin) * _TIME_PRECISION, part))
+            last = cut
+        if last < len(tokens):
+            # transcribe 会从最后一个时间戳处起下一窗口重解码余下部分；整段只有一个
+            # 窗口时没有下一窗口，余下的文本归入到音频结尾的一段
+            spans.append(((tokens[last - 1] - begin) * _TIME_PRECISION, duration,
+                          tokens[last:]))
+    else:
+        end = duration
+        stamps = [t for t in tokens if t >= begin]
+        if stamps and stamps[-1] != begin:
+            end = (stamps[-1] - begin) * _TIME_PRECISION
+        spans.append((0.0, end, tokens))
+
+    segments = []
+    for start, end, part in spans:
+        text = tokenizer.decode([t for t in part if t < tokenizer.eot])
+        if not text.strip():
+            continue
+        segments.append(dict(meta, id=len(segments), seek=0,
+                             start=round(min(start, duration), 3),
+                             end=round(min(max(end, start), duration), 3),
+                             text=text, tokens=list(part)))
+    return segments
+
+
+def transcribe_batch(model, audios, language=None, task='transcribe'):
+    """一次前向转录一批短音频，返回与 audios 等长的 result dict 列表。
+
+    需要温度回退的条目为 None（调用方应改用 model.transcribe 单独转录）；
+    判定为无语音的条目返回空分段。
+    """
+    import torch
+    import whisper
+    from whisper.audio import N_FRAMES, log_mel_spectrogram, pad_or_trim
+    from whisper.tokenizer import get_tokenizer
+
+    device = model.device
+    mels = []
+    for audio in audios:
+        # 与 transcribe 相同：末尾补一窗静音求 mel，截取有效帧后再补零到整窗
+        mel = log_mel_spectrogram(audio, model.dims.n_mels, padding=WINDOW_SAMPLES,
+                                  device=device)
+        mels.append(pad_or_trim(mel[:, :mel.shape[-1] - N_FRAMES], N_FRAMES))
+    batch = torch.stack(mels)
+    fp16 = device.type == 'cuda'
+    options = whisper.DecodingOptions(task=task, language=language, temperature=0.0,
+                                      fp16=fp16)
+    decoded = whisper.decode(model, batch.half() if fp16 else batch, options)
+
+    kwargs = {'num_languages': model.num_languages} if hasattr(model, 'num_languages') else {}
+    tokenizer = get_tokenizer(model.is_multilingual, language=language or 'en', task=task,
+                              **kwargs)
+    results = []
+    for audio, res in zip(audios, decoded):
+        silent = res.no_speech_prob > _NO_SPEECH and res.avg_logprob < _MIN_LOGPROB
+        if silent:
+            results.append({'text': '', 'segments': [], 'language': res.language})
+            continue
+        if res.compression_ratio > _MAX_COMPRESSION or res.avg_logprob < _MIN_LOGPROB:
+            results.append(None)
+            continue
+        meta = {'temperature': 0.0, 'avg_logprob': res.avg_logprob,
+                'compression_ratio': res.compression_ratio,
+                'no_speech_prob': res.no_speech_prob}
+        segments = _segments(list(res.tokens), tokenizer, len(audio) / SAMPLE_RATE, meta)
+        results.append({'text': ''.join(s['text'] for s in segments),
+                        'segments': segments, 'language': res.language})
+    return results
@@ -0,0 +1,140 @@
+"""长音频切块与结果拼接。
+
+长录音整段交给 transcribe 只能按 30 秒窗口串行推进；切成若干块后可以分给多个
+进程并行转录（见 transcribe_pool.run_pool 的 chunk_s 模式），再把各块结果拼回：
+
+- plan_chunks：在每个目标切点附近找最安静的位置下刀（尽量不切断句子），
+  相邻块在切点两侧各重叠 overlap_s 秒，给模型留出上下文；
+- stitch：把各块的分段平移回原时间轴；每个切点两侧的重叠区只采信「归属」于
+  该侧的分段（按分段中点判定），去掉跨边界重复（含近似重复）的同一句，最后把
+  分段裁到所属块的范围内、并截止于下一段开始，保证输出的字幕时间不交叠。
+"""
+from collections import Counter, namedtuple
+from difflib import SequenceMatcher
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# start/end：送去转录的采样区间；keep_from/keep_to：该块负责的（不含重叠的）区间
+Chunk = namedtuple('Chunk', 'start end keep_from keep_to')
+
+_FRAME_S = 0.1      # 能量帧长（秒）
+_SMOOTH = 5         # 能量平滑帧数：偏好持续静音而非单帧低谷
+_SIMILAR = 0.8      # 重叠区两句文本相似度不低于此视为同一句
+
+
+def _quietest_point(audio, lo, hi, sr):
+    """返回 [lo, hi) 内平滑短时能量最低处的采样位置。"""
+    frame = max(1, int(_FRAME_S * sr))
+    n = (hi - lo) // frame
+    if n <= 0:
+        return (lo + hi) // 2
+    energy = np.square(audio[lo:lo + n * frame].reshape(n, frame), dtype=np.float32).mean(axis=1)
+    k = min(_SMOOTH, n)
+    if k > 1:
+        energy = np.convolve(energy, np.full(k, 1.0 / k, dtype=np.float32), mode='same')
+    return lo + int(np.argmin(energy)) * frame + frame // 2
+
+
+def plan_chunks(audio, chunk_s=300, overlap_s=2.0, search_s=30.0, sr=SAMPLE_RATE):
+    """把 PCM 规划为约 chunk_s 秒的块，返回 [Chunk, ...]。
+
+    不足 1.5 倍 chunk_s 的音频不切（返回单块）；末块吸收余下不足半块的尾巴。
+    """
+    n = len(audio)
+    size = int(chunk_s * sr)
+    if size <= 0 or n <= size * 3 // 2:
+        return [Chunk(0, n, 0, n)]
+    search = int(search_s * sr)
+    overlap = int(overlap_s * sr)
+
+    cuts = []
+    prev = 0
+    while n - prev > size * 3 // 2:
+        target = prev + size
+        lo = max(prev + size // 2, target - search)
+        hi = min(n - size // 2, target + search)
+        cut = _quietest_point(audio, lo, hi, sr) if hi > lo else target
+        cuts.append(cut)
+        prev = cut
+
+    bounds = [0] + cuts + [n]
+    chunks = []
+    for i in range(len(bounds) - 1):
+        keep_from, keep_to = bounds[i], bounds[i + 1]
+        chunks.append(Chunk(max(0, keep_from - overlap), min(n, keep_to + overlap),
+                            keep_from, keep_to))
+    return chunks
+
+
+def _shift(seg, offset):
+    seg = dict(seg)
+    seg['start'] = float(seg['start']) + offset
+    seg['end'] = float(seg['end']) + offset
+    if seg.get('words'):
+        seg['words'] = [dict(w, start=float(w['start']) + offset, end=float(w['end']) + offset)
+                        for w in seg['words']]
+    return seg
+
+
+def _same_sentence(a, b):
+    """两段文本是否为同一句的两次识别（相同、互相包含或高度相似）。"""
+    a, b = a.strip(), b.strip()
+    if not a or not b:
+        return a == b
+    return a in b or b in a or SequenceMatcher(None, a, b).ratio() >= _SIMILAR
+
+
+def _clamp(seg, lo, hi):
+    seg['start'] = min(max(seg['start'], lo), hi)
+    seg['end'] = min(max(seg['end'], seg['start']), hi)
+    if seg.get('words'):
+        seg['words'] = [dict(w, start=min(max(w['start'], seg['start']), seg['end']),
+                             end=min(max(w['end'], seg['start']), seg['end']))
+                        for w in seg['words']]
+
+
+def stitch(chunks, parts, sr=SAMPLE_RATE):
+    """拼接各块的转录结果（whisper 风格 dict，时间相对块起点），返回整段 result dict。"""
+    segments = []    # (分段, 所属块的 keep 区间)
+    languages = Counter()
+    for chunk, res in zip(chunks, parts):
+        if res.get('language'):
+            languages[res['language']] += 1
+        offset = chunk.start / sr
+        keep_from, keep_to = chunk.keep_from / sr, chunk.keep_to / sr
+        for seg in res.get('segments') or []:
+            seg = _shift(seg, offset)
+            mid = (seg['start'] + seg['end']) / 2
+            if keep_from <= mid < keep_to:
+                segments.append((seg, keep_from, keep_to))
+
+    # 重叠区去重：同一句话在边界两侧各被识别一次（文本相同或近似），且时间相互交叠；
+    # 合并为一段：保留较完整（较长）的文本，时间取两者并集
+    deduped = []
+    for item in segments:
+        seg = item[0]
+        if deduped:
+            last, lo, hi = deduped[-1]
+            if seg['start'] < last['end'] and _same_sentence(seg['text'], last['text']):
+                keep = seg if len(seg['text'].strip()) > len(last['text'].strip()) else last
+                keep = dict(keep, start=min(seg['start'], last['start']),
+                            end=max(seg['end'], last['end']))
+                deduped[-1] = (keep, min(lo, item[1]), max(hi, item[2]))
+                continue
+        deduped.append(item)
+
+    # 裁剪：不越出所属块的范围，且不晚于下一段（裁剪后）的开始
+    starts = [min(max(seg['start'], lo), hi) for seg, lo, hi in deduped] + [float('inf')]
+    for i, (seg, keep_from, keep_to) in enumerate(deduped):
+        _clamp(seg, keep_from, max(starts[i], min(keep_to, starts[i + 1])))
+    deduped = [seg for seg, _, _ in deduped]
+
+    for i, seg in enumerate(deduped):
+        seg['id'] = i
+    return {
+        'text': ''.join(seg['text'] for seg in deduped),
+        'segments': deduped,
+        'language': languages.most_common(1)[0][0] if languages else None,
+    }
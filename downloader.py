@@ -2,60 +2,288 @@
 
 对外提供：
 - parallel_download(url, dest, on_progress, connections): 通用多连接分块下载，
-  服务器不支持 Range 时自动回退单流。
+  服务器不支持 Range 时自动回退单流；dest.part 旁保存分块完成位图，进程重启 / 失败后
+  核对远端大小与 ETag 一致即只补下缺失的块。连接数按实测总吞吐自适应增减，
+  逐连接的字节 / 卡顿 / 重试统计随 on_progress 回调给出。
+- download_many(items, on_progress, connections): 多个文件共用一个分块队列与一组连接，
+  小文件与大文件重叠下载，进度按总量汇总；每个文件可给多个镜像 URL，先小范围测速
+  选最快的（spread=True 时按实时速度把分块分给多个镜像，变慢 / 出错的镜像让出分块）。
 - ensure_whisper_model(size, ...): 把 openai-whisper 的 .pt 下到 ~/.cache/whisper，
-  下完交由 whisper.load_model 校验（sha 不符会自动重下）。
-- ensure_mlx_model(size, ...): 把 mlx-community/whisper-{size}-mlx 仓库文件下到本地目录，
+  按 URL 中的 sha256 边下边校验。
+- ensure_mlx_model(size, ...): 把 mlx-community/whisper-{size}-mlx 仓库文件一并下到本地目录，
   返回该目录路径，供 mlx_whisper.transcribe(path_or_hf_repo=<dir>) 离线加载。
+- 下载完成后写本地清单（文件名 / 大小 / sha256 / 总字节），之后的缓存判断与大小显示
+  只读清单，不访问网络、不遍历目录。
+- 完整性边下边校验：已知 sha256（whisper 的 URL、HF 的 LFS 元数据）时在下载过程中
+  顺序累积整文件摘要，每个位图块另记 BLAKE2b 摘要，续传时只重下校验不过的块；
+  通过校验的 whisper .pt 由 transcriber 按路径加载，不再被 load_model 整读重算。
 
 设计原则：均为「优化层」，任何异常都应由调用方捕获并回退到后端自带的下载逻辑，
 绝不因下载加速失败而影响转录本身。
 """
 import os
+import json
+import hashlib
 import time
-import queue
 import threading
+import http.client
+import urllib.error
+import urllib.parse
 import urllib.request
 
+from concurrent.futures import ThreadPoolExecutor
+
 _CHUNK = 1 << 20          # 1 MiB 读缓冲
 _CHUNK_SIZE = 16 << 20    # 16 MiB 任务块（队列工作窃取，抗慢尾）
-_DEFAULT_CONNECTIONS = 8
+_BLOCK = 2 << 20          # 2 MiB 位图粒度：续传单位，也是收尾阶段的最小任务块
+_DEFAULT_CONNECTIONS = 4  # 起始连接数，之后按吞吐自适应
+_MAX_CONNECTIONS = 32
+_SAMPLE_S = 2.0           # 吞吐采样 / 连接数调整周期（秒）
+_GAIN = 1.10              # 加连接后总吞吐至少提升 10% 才继续加
 _TIMEOUT = 45             # 单次读/连接超时（秒）：超过即判定卡住并续传重试
 _RETRIES = 6             # 每个块连续「无进展」重试上限
+_ROUNDS = 3               # 失败块的补下轮数（每轮只重下上一轮失败的块）
+_HASH_STEP = 64 << 20     # 整文件摘要每个采样周期最多推进的字节数（不拖慢进度回调）
+_MAX_REDIRECTS = 8
+_PROBE_BYTES = 256 << 10  # 镜像测速请求的字节数
+_PROBE_TIMEOUT = 10
+_LAG_S = 5.0              # 单段下载至少跑这么久才判断镜像是否掉速
+_LAG_RATIO = 4            # 比其他可用镜像慢 4 倍以上即让出剩余分块
+_PENALTY_S = 30.0         # 出错 / 掉速镜像的冷却时间
+# endpoint='auto' 时参与测速的 HF 端点（None 为官方）
+HF_ENDPOINTS = ('https://hf-mirror.com', None)
 _UA = {'User-Agent': 'SRT_gen/2.x'}
 
 
 def _resolve(url, timeout=_TIMEOUT):
-    """探测大小与是否支持 Range（用 bytes=0-0 单字节请求）。
+    """探测大小、是否支持 Range 与内容校验标识（用 bytes=0-0 单字节请求）。
 
-    返回 (total_bytes, ranges_supported)；total 为 0 表示未知。
-    注意：不复用重定向后的 CDN URL —— HuggingFace 的 resolve 会重定向到带签名、
-    短时效的 CDN 链接，复用到多个分块请求上会失败；每个分块需各自请求原始 URL，
-    由 urllib 每次重新重定向。
+    返回 (total_bytes, ranges_supported, validator)；total 为 0 表示未知，
+    validator 取 ETag（无则 Last-Modified），用于判断续传的 .part 是否仍对应同一内容。
+    注意：这里不记录重定向后的 CDN URL —— HuggingFace 的 resolve 会重定向到带签名、
+    短时效的 CDN 链接，长时间下载中途会过期；分块请求由 _Session 复用直链，
+    过期时再从原始 URL 重新重定向。
     """
     try:
         req = urllib.request.Request(url, headers={**_UA, 'Range': 'bytes=0-0'})
         with urllib.request.urlopen(req, timeout=timeout) as r:
-            status = getattr(r, 'status', r.getcode())
-            cr = r.headers.get('Content-Range')
-            if status == 206 and cr and '/' in cr:
-                try:
-                    return int(cr.rsplit('/', 1)[1]), True
-                except ValueError:
-                    pass
-            cl = r.headers.get('Content-Length')
-            return (int(cl) if cl and cl.isdigit() else 0), False
+            return _range_info(r)
+    except Exception:
+        return 0, False, None
+
+
+def _range_info(r):
+    """从 Range 请求的响应头解析 (total_bytes, ranges_supported, validator)。"""
+    status = getattr(r, 'status', r.getcode())
+    validator = r.headers.get('ETag') or r.headers.get('Last-Modified')
+    cr = r.headers.get('Content-Range')
+    if status == 206 and cr and '/' in cr:
+        try:
+            return int(cr.rsplit('/', 1)[1]), True, validator
+        except ValueError:
+            pass
+    cl = r.headers.get('Content-Length')
+    return (int(cl) if cl and cl.isdigit() else 0), False, validator
+
+
+def probe_mirror(url, nbytes=_PROBE_BYTES, timeout=_PROBE_TIMEOUT):
+    """用一次小范围请求给镜像测速（含握手与重定向耗时，高延迟链路上这正是瓶颈）。
+
+    返回 (bytes_per_sec, total_bytes, ranges_supported, validator)；请求失败时速度为 0。
+    """
+    t0 = time.perf_counter()
+    try:
+        req = urllib.request.Request(url, headers={**_UA, 'Range': f'bytes=0-{nbytes - 1}'})
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            info = _range_info(r)
+            got = len(r.read(nbytes))
     except Exception:
-        return 0, False
+        return 0.0, 0, False, None
+    return got / max(time.perf_counter() - t0, 1e-6), info[0], info[1], info[2]
+
+
+def rank_mirrors(urls, nbytes=_PROBE_BYTES, timeout=_PROBE_TIMEOUT):
+    """并发测速，返回按速度从快到慢排序的可用 URL 列表（全部失败时返回空列表）。"""
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as ex:
+        rates = list(ex.map(lambda u: probe_mirror(u, nbytes, timeout)[0], urls))
+    return [u for r, u in sorted(zip(rates, urls), key=lambda x: -x[0]) if r > 0]
+
+
+class _ResumeState:
+    """dest.part 旁的分块完成位图（dest.part.state），使下载可跨进程重启续传。
+
+    记录文件标识（见 _resume_key）/ 总大小 / 校验标识 / 块大小，任一不符即视为失效
+    从头下载。每完成一块在内存中置位，并记下该块落盘数据的 BLAKE2b 摘要；由
+    download_many 的采样线程定时 flush，结束或出错时再 flush 一次，下载线程不做文件
+    I/O。进程崩溃最多丢失最近一个采样周期的完成记录（重下即可）；续传前逐块重算摘要
+    核对，没写完整的块会被识别出来单独重下。
+    """
+
+    def __init__(self, part, key, total, validator, chunk_size):
+        self.path = part + '.state'
+        self.part = part
+        self.meta = {'key': key, 'total': total, 'validator': validator,
+                     'chunk_size': chunk_size}
+        self.count = (total + chunk_size - 1) // chunk_size
+        self.bits = bytearray((self.count + 7) // 8)
+        self.digests = [None] * self.count
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()     # 串行化写盘（共用同一个 .tmp）
+
+    def load(self):
+        """读取并核对既有状态；可续传返回 True。"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (any(data.get(k) != v for k, v in self.meta.items())
+                    or os.path.getsize(self.part) != self.meta['total']):
+                return False
+            bits = bytes.fromhex(data['done'])
+            digests = data.get('digests') or [None] * self.count
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if len(bits) != len(self.bits) or len(digests) != self.count:
+            return False
+        self.bits[:] = bits
+        self.digests = list(digests)
+        self._verify()
+        return True
+
+    def _verify(self):
+        """重算已完成块的摘要，与记录不符的块清除完成位（旧状态文件无摘要则信任）。"""
+        size = self.meta['chunk_size']
+        bad = 0
+        with open(self.part, 'rb') as f:
+            for i in range(self.count):
+                if not self.is_done(i) or self.digests[i] is None:
+                    continue
+                f.seek(i * size)
+                if _block_digest(f.read(size)) != self.digests[i]:
+                    self.bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+                    self.digests[i] = None
+                    bad += 1
+        if bad:
+            self.save()
+
+    def save(self):
+        with self.io_lock:
+            with self.lock:         # 只在锁内取快照，写盘不阻塞 mark_done
+                data = dict(self.meta, done=self.bits.hex(), digests=list(self.digests))
+                self.dirty = False
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+
+    def flush(self):
+        """有新完成的块时写盘；失败只影响续传，不影响本次下载。"""
+        if not self.dirty:
+            return
+        try:
+            self.save()
+        except OSError:
+            self.dirty = True
+
+    def is_done(self, i):
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    def mark_done(self, i, digest=None):
+        with self.lock:
+            self.bits[i >> 3] |= 1 << (i & 7)
+            self.digests[i] = digest
+            self.dirty = True
+
+    def done_bytes(self):
+        size = self.meta['chunk_size']
+        total = self.meta['total']
+        return sum(min(size, total - i * size) for i in range(self.count) if self.is_done(i))
+
+    def remove(self):
+        for p in (self.path, self.path + '.tmp'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def _block_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Sha256Follower:
+    """按文件顺序跟进已完成的块，从 .part（刚写入，多在页缓存中）累积整文件 sha256。
+
+    分块并行下载是乱序落盘的，无法在网络流上直接做顺序哈希；跟进器在下载线程的采样
+    周期里推进连续完成的前缀，下载结束时通常只剩最后几块，省掉下完后整读一遍大文件。
+    """
+
+    def __init__(self, part, state):
+        self.f = open(part, 'rb')
+        self.state = state
+        self.size = state.meta['chunk_size']
+        self.next = 0
+        self.sha = hashlib.sha256()
+        self.buf = bytearray(self.size)
+
+    def advance(self, budget=None):
+        """推进连续完成的前缀（最多约 budget 字节），返回本次读取的字节数。"""
+        view = memoryview(self.buf)
+        spent = 0
+        while self.next < self.state.count and self.state.is_done(self.next):
+            if budget is not None and spent >= budget:
+                break
+            self.f.seek(self.next * self.size)
+            n = self.f.readinto(view)
+            self.sha.update(view[:n])
+            spent += n
+            self.next += 1
+        return spent
+
+    def hexdigest(self):
+        self.advance()
+        self.close()
+        return self.sha.hexdigest()
+
+    def close(self):
+        self.f.close()
+
+
+class _ConnStats:
+    """单个连接（worker 线程）的累计统计；speed 为最近一个采样周期的速度。"""
+
+    __slots__ = ('id', 'bytes', 'stalls', 'retries', 'errors', 'speed', 'alive', '_mark')
+
+    def __init__(self, cid):
+        self.id = cid
+        self.bytes = self.stalls = self.retries = self.errors = 0
+        self.speed = 0.0
+        self.alive = True
+        self._mark = 0
+
+    def sample(self, interval):
+        self.speed = (self.bytes - self._mark) / interval if interval > 0 else 0.0
+        self._mark = self.bytes
+
+    def as_dict(self):
+        return {'id': self.id, 'bytes': self.bytes, 'speed': self.speed, 'stalls': self.stalls,
+                'retries': self.retries, 'errors': self.errors, 'alive': self.alive}
+
+
+def _is_throttle(exc):
+    """服务器限流 / 过载（429、503）：应减少连接而不是原地重试。"""
+    return isinstance(exc, urllib.error.HTTPError) and exc.code in (429, 503)
 
 
 def _single_stream(url, part_path, total, on_progress, timeout=_TIMEOUT, retries=_RETRIES):
-    """单流下载（服务器不支持 Range）。卡住/失败则重试（从头）。"""
+    """单流下载（服务器不支持 Range）。卡住/失败则重试（从头）。返回整文件 sha256。"""
     attempt = 0
+    conn = _ConnStats(0)
     while True:
         try:
             t0 = time.time()
             done = 0
+            sha = hashlib.sha256()
             req = urllib.request.Request(url, headers=_UA)
             with urllib.request.urlopen(req, timeout=timeout) as r, open(part_path, 'wb') as f:
                 while True:
@@ -63,119 +291,642 @@ def _single_stream(url, part_path, total, on_progress, timeout=_TIMEOUT, retries
                     if not buf:
                         break
                     f.write(buf)
+                    sha.update(buf)
                     done += len(buf)
+                    conn.bytes += len(buf)
                     if on_progress:
                         el = time.time() - t0
-                        on_progress(done, total or done, done / el if el > 0 else 0)
-            return
-        except Exception:
+                        conn.speed = done / el if el > 0 else 0
+                        on_progress(done, total or done, conn.speed, [conn.as_dict()])
+            return sha.hexdigest()
+        except Exception as e:
+            conn.errors += 1
+            if isinstance(e, OSError) and 'timed out' in str(e):
+                conn.stalls += 1
             attempt += 1
             if attempt > retries:
                 raise
+            conn.retries += 1
             time.sleep(min(2 * attempt, 8))
 
 
-def parallel_download(url, dest, on_progress=None, connections=_DEFAULT_CONNECTIONS,
-                      timeout=_TIMEOUT, retries=_RETRIES, chunk_size=_CHUNK_SIZE):
-    """多线程「小块任务队列」下载到 dest（先写 dest.part 再原子替换）。
+class _Session:
+    """单个连接（worker）的 keep-alive HTTP 会话：按 (scheme, host) 复用 http.client 连接。
+
+    每次分块请求都走 urlopen 要重新握手 TCP + TLS 并重走一遍 HF 的重定向；这里同一
+    worker 的连接常开复用（跨文件共用），并按原始 URL 记住重定向后的 CDN 链接直接请求。签名链接会过期：
+    CDN 返回 401 / 403 / 410 时丢掉它，从原始 URL 重新走重定向拿新链接。
+    配置了代理（环境变量）时 http.client 不会走代理，退回逐块 urlopen。
+    """
+
+    def __init__(self, timeout=_TIMEOUT):
+        self.timeout = timeout
+        self.targets = {}           # 原始 URL → 重定向得到的（签名）直链
+        self.pool = {}
+        self.proxied = bool(urllib.request.getproxies())
+
+    def _conn(self, parts):
+        key = (parts.scheme, parts.netloc)
+        conn = self.pool.get(key)
+        if conn is None:
+            cls = (http.client.HTTPSConnection if parts.scheme == 'https'
+                   else http.client.HTTPConnection)
+            conn = self.pool[key] = cls(parts.netloc, timeout=self.timeout)
+        return key, conn
+
+    def _drop(self, key):
+        conn = self.pool.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+    def get_range(self, origin, start, end):
+        """GET origin 的 bytes=start-end，返回可 readinto 的 206 响应（须读完或随后 close 会话）。"""
+        headers = {**_UA, 'Range': f'bytes={start}-{end}'}
+        if self.proxied:
+            return urllib.request.urlopen(
+                urllib.request.Request(origin, headers=headers), timeout=self.timeout)
+        url = self.targets.get(origin, origin)
+        for _ in range(_MAX_REDIRECTS):
+            parts = urllib.parse.urlsplit(url)
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            key, conn = self._conn(parts)
+            reused = conn.sock is not None
+            try:
+                conn.request('GET', path, headers=headers)
+                r = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                self._drop(key)
+                if not reused:
+                    raise
+                # 空闲时被服务器关掉的 keep-alive 连接：换新连接重发一次
+                key, conn = self._conn(parts)
+                conn.request('GET', path, headers=headers)
+                r = conn.getresponse()
+            if r.status in (301, 302, 303, 307, 308) and r.getheader('Location'):
+                r.read()
+                url = urllib.parse.urljoin(url, r.getheader('Location'))
+                continue
+            if r.status in (401, 403, 410) and url != origin:
+                r.read()
+                self.targets.pop(origin, None)  # 签名直链过期 → 回原始 URL 重新解析
+                url = origin
+                continue
+            if r.status != 206:
+                self._drop(key)         # 不读可能很大的响应体，直接弃用该连接
+                raise urllib.error.HTTPError(url, r.status, r.reason, r.headers, None)
+            if url != origin:
+                self.targets[origin] = url
+            return r
+        raise IOError(f'重定向次数过多：{origin}')
+
+    def close(self):
+        for key in list(self.pool):
+            self._drop(key)
+
+
+class _PartFile:
+    """.part 的共享写入端：一个 fd 上按偏移 os.pwrite，各连接无需各自 open / seek。
+
+    没有 os.pwrite 的平台（Windows）退回为每个连接一个常开句柄 seek + write，
+    仍只在连接启动时打开一次。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+
+    def writer(self):
+        """返回本连接的 write(view, offset)（附 close()）。"""
+        if hasattr(os, 'pwrite'):
+            return _PWriter(self.fd)
+        return _SeekWriter(open(self.path, 'r+b', buffering=0))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PWriter:
+    __slots__ = ('fd',)
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __call__(self, view, offset):
+        while view:
+            n = os.pwrite(self.fd, view, offset)
+            view, offset = view[n:], offset + n
+
+    def close(self):
+        pass
+
+
+class _SeekWriter:
+    __slots__ = ('f',)
+
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, view, offset):
+        self.f.seek(offset)
+        while view:
+            n = self.f.write(view)
+            view = view[n:]
+
+    def close(self):
+        self.f.close()
+
+
+class _Scheduler:
+    """待下块的分配与连接数控制（由 download_many 的 worker / 采样线程共用）。
+
+    待下队列是所有文件的 (job, 块号) 混排：小文件排在前面，开头几个连接先把配置、
+    分词表等小文件取完，其余连接同时开始拉大权重，不再逐个文件串行。
+
+    - claim：从待下位图块中取同一文件的一段连续块；正常取满 chunk_size，剩余量不足以让每个
+      活跃连接再领两段时按剩余量均分缩小，收尾阶段退到单个位图块，慢尾最多一个 2 MiB 块；
+    - tick：每个采样周期比较总吞吐：加连接后提升 ≥10% 则继续加（每次约增 50%），
+      提升不明显即停在当前值；周期内出现限流或连接错误则减少约 1/4 的连接并不再增加；
+    - stop（threading.Event）置位后 claim / join 一律拒绝，中止后不再分出新的块。
+    """
+
+    def __init__(self, pending, per_claim, start, limit, stop=None):
+        self.pending = list(pending)
+        self.pending.reverse()       # 尾部弹出 = 按偏移升序领取
+        self.per_claim = max(1, per_claim)
+        self.target = max(1, min(start, limit))
+        self.limit = limit
+        self.alive = 0
+        self.growing = True
+        self.best = 0.0
+        self.errors = 0              # 本采样周期内的错误 / 限流次数
+        self.stop = stop or threading.Event()
+        self.lock = threading.Lock()
+
+    def claim(self):
+        """返回 (job, 连续块号列表)；无块或本连接应退出（连接数超出目标）时返回 None。"""
+        with self.lock:
+            if not self.pending or self.alive > self.target or self.stop.is_set():
+                self.alive -= 1
+                return None
+            left = len(self.pending)
+            n = min(self.per_claim, max(1, left // (2 * max(1, self.alive))))
+            job, i = self.pending.pop()
+            run = [i]
+            while len(run) < n and self.pending and self.pending[-1] == (job, run[-1] + 1):
+                run.append(self.pending.pop()[1])
+            return job, run
+
+    def requeue(self, entries):
+        """把换镜像重下的块放回队首（由调用的 worker 紧接着领取）。"""
+        with self.lock:
+            self.pending.extend(reversed(entries))
+
+    def join(self):
+        """登记新连接；返回 False 表示已达目标或没有剩余块。"""
+        with self.lock:
+            if self.alive >= self.target or not self.pending or self.stop.is_set():
+                return False
+            self.alive += 1
+            return True
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def tick(self, rate):
+        """按本周期总吞吐 rate（B/s）调整目标连接数，返回调整后的目标。"""
+        with self.lock:
+            if self.errors:
+                self.target = max(1, self.target - max(1, self.target // 4))
+                self.growing = False
+            elif self.growing and self.alive >= self.target:
+                if rate >= self.best * _GAIN:
+                    self.best = rate
+                    self.target = min(self.limit, self.target + max(1, self.target // 2))
+                else:
+                    self.growing = False
+            self.errors = 0
+            return self.target
+
+
+class _Lagging(Exception):
+    """当前镜像明显慢于其他可用镜像：让出本段剩余分块。"""
+
+
+class _Stopped(Exception):
+    """download_many 已中止（出错或被中断）：本段不再请求、不再写入。"""
+
+
+class _Mirrors:
+    """多镜像的实时评分与选择（download_many 中所有文件共用，按镜像序号索引）。
+
+    每个镜像记一个单连接吞吐的 EWMA（初值为测速结果）。默认只用最快的可用镜像，
+    它出错或掉速时进入冷却，分块自动转到次快的镜像；spread=True 时按
+    「速度 /（在用连接数 + 1）」把每段分给收益最大的镜像，多个镜像同时供数。
+    """
+
+    def __init__(self, rates, spread=False):
+        self.rate = list(rates)
+        self.active = [0] * len(rates)
+        self.cooldown = [0.0] * len(rates)
+        self.spread = spread
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rate)
+
+    def pick(self, job):
+        """为 job 的下一段选择镜像序号（并计入在用连接）。"""
+        with self.lock:
+            now = time.time()
+            usable = [m for m, u in enumerate(job.urls) if u is not None]
+            ready = [m for m in usable if self.cooldown[m] <= now] or usable
+            if self.spread:
+                m = max(ready, key=lambda k: self.rate[k] / (1 + self.active[k]))
+            else:
+                m = max(ready, key=lambda k: self.rate[k])
+            self.active[m] += 1
+            return m
+
+    def release(self, m, nbytes, seconds, failed=False):
+        """一段结束：更新速度估计；失败 / 掉速的镜像降分并冷却一段时间。"""
+        with self.lock:
+            self.active[m] -= 1
+            if nbytes and seconds > 0:
+                self.rate[m] = 0.7 * self.rate[m] + 0.3 * nbytes / seconds
+            if failed:
+                self.rate[m] *= 0.5
+                self.cooldown[m] = time.time() + _PENALTY_S
+
+    def lagging(self, m, nbytes, seconds):
+        """本段在镜像 m 上的速度不及其他可用镜像的 1/4 时返回 True。"""
+        if seconds < _LAG_S or len(self.rate) < 2:
+            return False
+        now = time.time()
+        others = [r for k, r in enumerate(self.rate) if k != m and self.cooldown[k] <= now]
+        return bool(others) and nbytes / seconds * _LAG_RATIO < max(others)
+
+    def alternatives(self, job, m):
+        """除 m 外 job 是否还有可用镜像。"""
+        return any(u is not None for k, u in enumerate(job.urls) if k != m)
+
+
+def _resume_key(url, sha256=None):
+    """续传位图的文件标识：sha256，或去掉镜像主机后的 URL 路径（各 HF 端点相同）。"""
+    return f'sha256:{sha256}' if sha256 else urllib.parse.urlsplit(url).path
+
+
+class _Job:
+    """download_many 中的一个文件：.part 的写入端、续传位图与整文件摘要跟进器。"""
+
+    def __init__(self, urls, dest, sha256, total, validator, block):
+        self.urls = urls            # 按镜像序号排列，某镜像不可用处为 None
+        self.url = next(u for u in urls if u is not None)
+        self.dest = dest
+        self.part = dest + '.part'
+        self.sha256 = sha256
+        self.total = total
+        self.block = block
+        # 续传状态按文件本身核对，不用某个镜像的 URL：'auto' 每次测速的镜像顺序可能
+        # 不同。有 sha256 时以它为准（各镜像的 ETag 不一定相同），否则用各镜像共有的
+        # 仓库路径
+        self.state = _ResumeState(self.part, _resume_key(self.url, sha256), total,
+                                  sha256 or validator, block)
+        if not self.state.load():
+            with open(self.part, 'wb') as f:
+                f.truncate(total)
+            self.state.save()
+        self.out = _PartFile(self.part)
+        self.follower = _Sha256Follower(self.part, self.state) if sha256 else None
+
+    def pending(self):
+        return [(self, i) for i in range(self.state.count) if not self.state.is_done(i)]
+
+    def finish(self):
+        """全部块完成后：校验摘要、清除位图并替换为正式文件（校验失败抛 IOError）。"""
+        digest = self.follower.hexdigest() if self.follower else None
+        self.out.close()
+        _check_sha256(digest, self.sha256, self.part, self.state)
+        self.state.remove()
+        os.replace(self.part, self.dest)
+
+    def abort(self):
+        """未下完：关闭文件，保留 .part 与位图供下次续传。"""
+        self.state.flush()
+        if self.follower is not None:
+            self.follower.close()
+        self.out.close()
+
+
+def download_many(items, on_progress=None, connections=_DEFAULT_CONNECTIONS,
+                  timeout=_TIMEOUT, retries=_RETRIES, chunk_size=_CHUNK_SIZE,
+                  max_connections=_MAX_CONNECTIONS, spread=False):
+    """把多个文件放进同一个分块队列、共用一组连接下载（先写 *.part 再原子替换）。
+
+    items 为 [(url, dest, sha256_or_None), ...]，返回各 dest。各文件先并发探测大小，
+    支持 Range 的文件全部按 2 MiB 位图块混排进一个队列（小文件在前，只占一块），
+    由同一组 worker 领取；不支持 Range 或大小未知的文件最后逐个单流下载。
+
+    多镜像：url 也可以是镜像 URL 的列表（各文件按同样的镜像顺序排列）。此时每个镜像
+    先用一次 256 KiB 的范围请求测速（大小不一致或失败的镜像不用于该文件），默认只从
+    最快的镜像下载，出错或掉到其他镜像 1/4 以下时剩余分块立即转给次快的镜像；
+    spread=True 时按实时速度同时从多个镜像取不同的分块（见 _Mirrors）。
 
     抗慢尾 + 抗卡住设计：
-    - 文件切成多个固定大小小块放入队列，多个 worker 各自领取：快连接领得多、慢连接
-      领得少，结尾最多只剩一个小块在最慢连接上，避免单个慢连接拖垮整体收尾；
-    - 每个小块内部「断点续传 + 重试」：连接中断或读卡住（超过 timeout 无数据）后从已写
+    - 多个 worker 各自领取同一文件的一段连续块：快连接领得多、慢连接领得少；剩余量变少时
+      领取粒度随之缩小到单个位图块，避免结尾一个慢连接独自拖着 16 MiB 收尾；
+    - 每段内部「断点续传 + 重试」：连接中断或读卡住（超过 timeout 无数据）后从已写
       位置继续，只要有进展就不消耗重试次数，连续无进展超过 retries 次才放弃；
-    - 任一小块彻底失败则整体失败（清理 .part 后抛出），由调用方回退后端自带下载；
-    - 每个块各自请求原始 URL 由 urllib 重新重定向，不复用 HF 带签名的短时效 CDN 链接。
+    - 每个连接持有 keep-alive 会话（_Session），分块请求复用同一 TCP / TLS 连接与重定向
+      后的 CDN 直链；HF 的签名直链过期（403 等）时回到原始 URL 重新解析；
+    - 写入路径无拷贝无锁：各连接 readinto 自己复用的缓冲，再按偏移 pwrite 到共享 fd；
+      进度由本线程定时汇总各连接计数后回调（on_progress 在调用线程中执行）。
 
-    on_progress(downloaded_bytes, total_bytes, speed_bytes_per_sec)。
-    服务器不支持 Range 或大小未知时回退为单流下载。
-    """
-    part = dest + '.part'
-    total, ranges_ok = _resolve(url, timeout=timeout)
+    自适应连接数：从 connections 个连接起步，每 2 秒采样一次总吞吐，仍在明显上升就继续
+    加连接（上限 max_connections），遇到连接错误或 429/503 限流则减少连接。
 
-    if not (ranges_ok and total > chunk_size and connections > 1):
-        _single_stream(url, part, total, on_progress, timeout=timeout, retries=retries)
-        os.replace(part, dest)
-        return dest
+    可续传：每个 *.part 旁的 .state 记录块完成位图。再次调用（包括进程重启后）时若远端
+    大小与 ETag 未变，只下载缺失的块；本轮失败的块在后续轮次单独重下，不丢弃已完成部分。
+    全部轮次后仍有块失败才抛出，并保留 .part 与位图供下次续传。
 
-    with open(part, 'wb') as f:
-        f.truncate(total)
+    sha256：期望的整文件摘要（十六进制）。给出时边下边算，不符则删除 .part 与位图后抛出
+    IOError（无法定位是哪一块出错，只能整体重下）。其余文件不受影响，照常完成。
 
-    tasks = queue.Queue()
-    for s in range(0, total, chunk_size):
-        tasks.put((s, min(s + chunk_size, total) - 1))
+    on_progress(downloaded_bytes, total_bytes, speed_bytes_per_sec, connections)，
+    字节数按全部文件汇总；connections 为各连接统计 dict 的列表（id / bytes / speed /
+    stalls / retries / errors / alive）。
+    """
+    items = [([u] if isinstance(u, str) else list(u), dest, sha) for u, dest, sha in items]
+    block = min(chunk_size, _BLOCK)
+    width = max(len(urls) for urls, _, _ in items) if items else 1
+    pairs = [(i, m) for i, (urls, _, _) in enumerate(items) for m in range(len(urls))]
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(pairs)))) as ex:
+        if width > 1:
+            found = list(ex.map(lambda p: probe_mirror(items[p[0]][0][p[1]]), pairs))
+        else:
+            found = list(ex.map(lambda p: (1.0,) + _resolve(items[p[0]][0][0], timeout=timeout),
+                                pairs))
+    probes = {p: f for p, f in zip(pairs, found)}
 
-    lock = threading.Lock()
-    state = {'done': 0, 't0': time.time()}
-    errors = []
+    jobs, streams = [], []
+    speeds = [[] for _ in range(width)]
+    for i, (urls, dest, sha) in enumerate(items):
+        live = [probes[(i, m)] if probes[(i, m)][0] > 0 else None for m in range(len(urls))]
+        ref = next((p for p in live if p is not None), (0, 0, False, None))
+        _, total, ranges_ok, validator = ref
+        usable = [u if p is not None and p[1] == total and p[2] else None
+                  for u, p in zip(urls, live)]
+        usable += [None] * (width - len(usable))
+        if ranges_ok and total > 0 and max_connections > 1 and any(usable):
+            jobs.append(_Job(usable, dest, sha, total, validator, block))
+            for m, p in enumerate(live):
+                if p is not None and usable[m]:
+                    speeds[m].append(p[0])
+        else:
+            streams.append((next((u for u, p in zip(urls, live) if p), urls[0]), dest, sha, total))
+    jobs.sort(key=lambda j: j.total)
+    mirrors = _Mirrors([sum(v) / len(v) if v else 0.0 for v in speeds], spread)
+
+    grand = sum(j.total for j in jobs) + sum(t for *_, t in streams)
+    resumed = sum(j.state.done_bytes() for j in jobs)
+    t0 = time.time()
+    conns = []
     stop = threading.Event()
 
-    def report(delta):
+    def emit():
         if not on_progress:
             return
-        with lock:
-            state['done'] += delta
-            el = time.time() - state['t0']
-            on_progress(state['done'], total, state['done'] / el if el > 0 else 0)
+        done = resumed + sum(c.bytes for c in conns)
+        el = time.time() - t0
+        on_progress(done, grand, (done - resumed) / el if el > 0 else 0,
+                    [c.as_dict() for c in conns])
 
-    def fetch_chunk(start, end):
-        pos = start
+    def fetch_range(conn, sched, session, job, run, write, view):
+        """下载 job 的连续块 run，逐块登记完成；返回 (未完成的块号列表, 是否可换镜像重试)。"""
+        block, total, state = job.block, job.total, job.state
+        first = run[0]
+        pos = first * block
+        end = min((run[-1] + 1) * block, total) - 1
+        h = hashlib.blake2b(digest_size=16)
         attempt = 0
-        while pos <= end and not stop.is_set():
+        m = mirrors.pick(job)
+        t_start, p_start = time.perf_counter(), pos
+        bad = False
+        while pos <= end:
             before = pos
             try:
-                req = urllib.request.Request(
-                    url, headers={**_UA, 'Range': f'bytes={pos}-{end}'})
-                with urllib.request.urlopen(req, timeout=timeout) as r, open(part, 'r+b') as f:
-                    f.seek(pos)
+                if stop.is_set():
+                    raise _Stopped()
+                with session.get_range(job.urls[m], pos, end) as r:
                     while True:
-                        buf = r.read(_CHUNK)
-                        if not buf:
+                        if mirrors.lagging(m, pos - p_start, time.perf_counter() - t_start):
+                            raise _Lagging()
+                        n = r.readinto(view)
+                        if not n:
                             break
-                        f.write(buf)
-                        pos += len(buf)
-                        report(len(buf))
-                        if stop.is_set():
-                            return False
-            except Exception:
-                pass
+                        if stop.is_set():    # 中止后不再写入：fd 即将由调用线程关闭
+                            raise _Stopped()
+                        write(view[:n], pos)
+                        # 逐块累积摘要，跨过块边界即登记该块完成（续传位图按块推进）
+                        off = 0
+                        while off < n:
+                            edge = min((first + 1) * block, total)
+                            take = min(n - off, edge - pos - off)
+                            h.update(view[off:off + take])
+                            off += take
+                            if pos + off == edge:
+                                state.mark_done(first, h.hexdigest())
+                                first += 1
+                                h = hashlib.blake2b(digest_size=16)
+                        pos += n
+                        conn.bytes += n
+            except Exception as e:
+                session.close()              # 连接状态未知（响应可能没读完），整体重建
+                if isinstance(e, _Stopped):
+                    break
+                if isinstance(e, _Lagging):
+                    bad = True
+                    break                    # 镜像掉速：剩余分块交给更快的镜像
+                conn.errors += 1
+                if _is_throttle(e):
+                    sched.error()
+                    bad = True
+                    if not mirrors.alternatives(job, m):
+                        stop.wait(min(2 * (attempt + 1), 8))
+                    break                    # 限流：交还剩余块，由其他连接 / 镜像 / 下一轮处理
+                if isinstance(e, OSError) and 'timed out' in str(e):
+                    conn.stalls += 1
+                sched.error()
+                if mirrors.alternatives(job, m):
+                    bad = True
+                    break                    # 有其他镜像：不在出错的镜像上原地重试
             if pos > end:
-                return True                  # 本块完成
+                mirrors.release(m, pos - p_start, time.perf_counter() - t_start)
+                return [], False
             if pos > before:
                 attempt = 0                  # 有进展 → 重置重试
             else:
                 attempt += 1
                 if attempt > retries:
-                    return False
-                time.sleep(min(2 * attempt, 8))
-        return pos > end
+                    break
+                conn.retries += 1
+                if stop.wait(min(2 * attempt, 8)):
+                    break
+        conn.bytes -= pos - first * block    # 未完成块的已写部分重下，进度回退
+        mirrors.release(m, pos - p_start, time.perf_counter() - t_start, failed=bad)
+        return list(range(first, run[-1] + 1)), bad and mirrors.alternatives(job, m)
 
-    def worker():
-        while not stop.is_set():
-            try:
-                start, end = tasks.get_nowait()
-            except queue.Empty:
-                return
-            if not fetch_chunk(start, end):
-                errors.append(IOError(f'分块 {start}-{end} 下载失败'))
-                stop.set()
-                return
-
-    threads = [threading.Thread(target=worker, daemon=True) for _ in range(connections)]
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
+    pending = [entry for j in jobs for entry in j.pending()]
+    moved = {}
+    target = connections
+    threads = []
+    try:
+        for rnd in range(_ROUNDS):
+            if not pending:
+                break
+            if rnd:
+                time.sleep(min(4 * rnd, 10))
+            sched = _Scheduler(pending, chunk_size // block, target, max_connections, stop)
+            failed = []
+            threads = []
 
-    if errors:
+            def worker(conn):
+                session = _Session(timeout)
+                writers = {}
+                view = memoryview(bytearray(_CHUNK))   # 每连接复用的读缓冲
+                try:
+                    while True:
+                        claim = sched.claim()
+                        if claim is None:
+                            return
+                        job, run = claim
+                        if job not in writers:
+                            writers[job] = job.out.writer()
+                        missed, movable = fetch_range(conn, sched, session, job, run,
+                                                      writers[job], view)
+                        if not missed:
+                            continue
+                        entries = [(job, i) for i in missed]
+                        # 换镜像立即重下（每块至多每个镜像一次），否则留到下一轮
+                        if movable and moved.get(entries[0], 0) < len(mirrors):
+                            for e in entries:
+                                moved[e] = moved.get(e, 0) + 1
+                            sched.requeue(entries)
+                        else:
+                            failed.extend(entries)
+                finally:
+                    conn.alive = False
+                    session.close()
+                    for w in writers.values():
+                        w.close()
+
+            def spawn():
+                # 只在本线程调用：conns 仅在此追加，worker 各自累加自己的计数，无需加锁
+                while sched.join():
+                    conn = _ConnStats(len(conns))
+                    conns.append(conn)
+                    t = threading.Thread(target=worker, args=(conn,), daemon=True)
+                    threads.append(t)
+                    t.start()
+
+            # 本线程兼作采样定时器：每 0.2 s 汇总各连接计数回调进度并推进摘要，
+            # 每 2 s 调整连接数并保存续传位图
+            spawn()
+            last = time.time()
+            mark = sum(c.bytes for c in conns)
+            while any(t.is_alive() for t in threads):
+                time.sleep(0.2)
+                emit()
+                budget = _HASH_STEP
+                for j in jobs:
+                    if j.follower is not None:
+                        budget -= j.follower.advance(budget)
+                now = time.time()
+                if now - last < _SAMPLE_S:
+                    continue
+                for j in jobs:
+                    j.state.flush()
+                got = sum(c.bytes for c in conns)
+                for c in conns:
+                    c.sample(now - last)
+                sched.tick((got - mark) / (now - last))
+                last, mark = now, got
+                spawn()
+            target = sched.target
+            for j in jobs:
+                j.state.flush()         # 轮次间隔可能较长：先把本轮的完成记录落盘
+            pending = sorted(failed, key=lambda e: (e[0].total, e[1]))
+    except BaseException:
+        # 先停下并等齐本轮的 worker（最多等一次读超时），再关闭 fd、保存位图：
+        # 否则游离的线程会继续领块、向已关闭（可能已被复用）的 fd 写入
+        stop.set()
+        for t in threads:
+            t.join()
+        for j in jobs:
+            j.abort()
+        raise
+    emit()
+
+    errors = []
+    missing = {}
+    for job, _ in pending:
+        missing[job] = missing.get(job, 0) + 1
+    for j in jobs:
+        if j in missing:
+            j.abort()
+            errors.append(f'{os.path.basename(j.dest)}：{missing[j]} 个分块下载失败'
+                          '（已保留进度，重试时续传）')
+            continue
         try:
-            os.remove(part)
-        except OSError:
-            pass
-        raise errors[0]
+            j.finish()
+        except IOError as e:
+            errors.append(str(e))
 
-    os.replace(part, dest)
-    return dest
+    base = resumed + sum(c.bytes for c in conns)
+    for url, dest, sha, total in streams:
+        def cb(done, _t, speed, conns=None, _base=base):
+            if on_progress:
+                on_progress(_base + done, grand or (_base + done), speed, conns)
+
+        part = dest + '.part'
+        try:
+            digest = _single_stream(url, part, total, cb, timeout=timeout, retries=retries)
+            _check_sha256(digest, sha, part, None)
+            base += os.path.getsize(part)
+            os.replace(part, dest)
+        except Exception as e:  # noqa: BLE001 - 汇总后统一抛出
+            errors.append(f'{os.path.basename(dest)}：{e}')
+
+    if errors:
+        raise IOError('；'.join(errors))
+    return [dest for _, dest, _ in items]
+
+
+def parallel_download(url, dest, on_progress=None, connections=_DEFAULT_CONNECTIONS,
+                      timeout=_TIMEOUT, retries=_RETRIES, chunk_size=_CHUNK_SIZE,
+                      max_connections=_MAX_CONNECTIONS, sha256=None, spread=False):
+    """多连接分块下载单个文件到 dest，参数与行为见 download_many；返回 dest。
+
+    url 可为镜像 URL 列表。服务器不支持 Range 或大小未知时回退为单流下载。
+    """
+    return download_many([(url, dest, sha256)], on_progress=on_progress,
+                         connections=connections, timeout=timeout, retries=retries,
+                         chunk_size=chunk_size, max_connections=max_connections,
+                         spread=spread)[0]
+
+
+def _check_sha256(digest, expected, part, state):
+    """摘要不符时丢弃 .part（及续传位图）并抛出 IOError；expected 为 None 时不校验。"""
+    if not expected or digest is None or digest == expected.lower():
+        return
+    if state is not None:
+        state.remove()
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    raise IOError(f'sha256 校验失败：{os.path.basename(part)[:-5]}（期望 {expected[:12]}…，'
+                  f'实际 {digest[:12]}…），已删除，请重试')
 
 
 def _whisper_root():
@@ -195,6 +946,72 @@ def mlx_cache_dir(repo_id):
     return os.path.join(_mlx_root(), repo_id.split('/')[-1])
 
 
+# ----------------------------- 本地清单 -----------------------------
+
+_MANIFEST = '.srtgen-manifest.json'
+
+
+def _mlx_manifest_path(repo_id):
+    return os.path.join(mlx_cache_dir(repo_id), _MANIFEST)
+
+
+def _whisper_manifest_path(pt_path):
+    return pt_path + '.manifest.json'
+
+
+def write_manifest(manifest_path, source, files, backfilled=False, verified=False):
+    """下载完成后记录清单：files 为 [(相对清单所在目录的文件名, 字节数, sha256或None), ...]。
+
+    backfilled=True 表示由本地目录反推（旧版本下载），只用于大小显示，
+    ensure_mlx_model 不据此跳过远端核对。verified=True 表示带 sha256 的文件都已在
+    下载时通过校验，加载时无需再整读重算。
+    """
+    data = {
+        'source': source,
+        'backfilled': backfilled,
+        'verified': verified,
+        'files': [{'name': n, 'size': int(sz), 'sha256': sha} for n, sz, sha in files],
+        'total_bytes': sum(int(sz) for _, sz, _ in files),
+        'created': int(time.time()),
+    }
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, manifest_path)
+    return data
+
+
+def read_manifest(manifest_path):
+    """读取清单并核对其中文件仍在且大小一致（逐个 stat，不遍历目录）；无效返回 None。"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        base = os.path.dirname(manifest_path)
+        for item in data['files']:
+            if os.path.getsize(os.path.join(base, item['name'])) != item['size']:
+                return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return data
+
+
+def cached_mlx_model_dir(repo_id):
+    """离线检查：本地目录已有完整 MLX 模型则返回该目录，否则 None。
+
+    有清单时按清单核对；旧版本下载（无清单）时退回检查配置 + 权重文件是否存在。
+    不访问网络；用于每次转录前快速判断，避免 ensure_mlx_model 的 model_info 往返。
+    """
+    d = mlx_cache_dir(repo_id)
+    if read_manifest(_mlx_manifest_path(repo_id)) is not None:
+        return d
+    if not os.path.exists(os.path.join(d, 'config.json')):
+        return None
+    for w in ('weights.safetensors', 'weights.npz', 'model.safetensors'):
+        if os.path.exists(os.path.join(d, w)):
+            return d
+    return None
+
+
 def dir_size(path):
     total = 0
     for root, _, files in os.walk(path):
@@ -218,25 +1035,82 @@ def whisper_cache_path(whisper_name):
     return os.path.join(_whisper_root(), os.path.basename(url))
 
 
+def whisper_sha256(whisper_name):
+    """whisper 下载 URL（.../models/<sha256>/<name>.pt）中的期望摘要；未知返回 None。"""
+    try:
+        import whisper
+    except Exception:
+        return None
+    url = getattr(whisper, '_MODELS', {}).get(whisper_name)
+    sha = url.split('/')[-2] if url else ''
+    return sha if len(sha) == 64 else None
+
+
+def verified_whisper_checkpoint(whisper_name):
+    """下载时已通过 sha256 校验（清单 verified 且大小一致）的 .pt 路径，否则 None。"""
+    p = whisper_cache_path(whisper_name)
+    if not p:
+        return None
+    m = read_manifest(_whisper_manifest_path(p))
+    return p if m is not None and m.get('verified') else None
+
+
+def _backfill_mlx_manifest(repo_id):
+    """为无清单的旧下载补写清单（仅遍历一次目录），此后大小显示走清单。"""
+    d = mlx_cache_dir(repo_id)
+    files = []
+    for root, dirs, names in os.walk(d):
+        for n in names:
+            if n == _MANIFEST or n.endswith(('.part', '.tmp')):
+                continue
+            p = os.path.join(root, n)
+            try:
+                files.append((os.path.relpath(p, d), os.path.getsize(p), None))
+            except OSError:
+                pass
+    try:
+        return write_manifest(_mlx_manifest_path(repo_id), repo_id, files,
+                              backfilled=True)['total_bytes']
+    except OSError:
+        return sum(sz for _, sz, _ in files)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
 def model_cache_info(apple, mlx_repo, whisper_name):
-    """返回 (是否已缓存, 字节数)。"""
+    """返回 (是否已缓存, 字节数)。有清单时只读清单，不遍历目录。
+
+    openai-whisper 的字节数包含由 .pt 转换出的 fp32 / int8 权重副本（见 weights）。
+    """
     if apple:
+        m = read_manifest(_mlx_manifest_path(mlx_repo))
+        if m is not None:
+            return True, m['total_bytes']
         d = mlx_cache_dir(mlx_repo)
         if os.path.isdir(d) and (os.path.exists(os.path.join(d, 'weights.npz'))
                                  or os.path.exists(os.path.join(d, 'weights.safetensors'))):
-            return True, dir_size(d)
+            return True, _backfill_mlx_manifest(mlx_repo)
         hub = _hf_hub_dir(mlx_repo)
         if os.path.isdir(hub):
             return True, dir_size(hub)
         return False, 0
     p = whisper_cache_path(whisper_name)
     if p and os.path.exists(p):
-        return True, os.path.getsize(p)
+        import weights
+        return True, os.path.getsize(p) + sum(map(_file_size, weights.derived_paths(p)))
     return False, 0
 
 
 def delete_model_cache(apple, mlx_repo, whisper_name):
-    """删除模型缓存，返回释放的字节数。"""
+    """删除模型缓存（openai-whisper 连同转换出的权重副本），返回释放的字节数。
+
+    有文件删不掉（Windows 上仍被映射的权重等）时，删完其余文件后抛出 OSError。
+    """
     import shutil
     freed = 0
     if apple:
@@ -246,10 +1120,25 @@ def delete_model_cache(apple, mlx_repo, whisper_name):
                 shutil.rmtree(d, ignore_errors=True)
     else:
         p = whisper_cache_path(whisper_name)
-        if p and os.path.exists(p):
-            freed += os.path.getsize(p)
+        if p:
+            import weights
+            # .pt 已被删掉时，残留的副本也一并清理
+            busy = []
+            for f in [p] + weights.derived_paths(p):
+                if not os.path.exists(f):
+                    continue
+                size = _file_size(f)
+                try:
+                    os.remove(f)
+                except OSError:
+                    busy.append(os.path.basename(f))
+                    continue
+                freed += size
+            if busy:
+                raise OSError(f'已释放 {freed >> 20} MB，以下文件正被占用，未能删除：'
+                              + '、'.join(busy))
             try:
-                os.remove(p)
+                os.remove(_whisper_manifest_path(p))
             except OSError:
                 pass
     return freed
@@ -259,7 +1148,8 @@ def ensure_whisper_model(whisper_name, on_progress=None, on_start=None,
                          connections=_DEFAULT_CONNECTIONS):
     """确保 openai-whisper 的 {name}.pt 已在 ~/.cache/whisper。
 
-    已存在则直接返回（由 whisper.load_model 负责 sha 校验/必要时重下）。
+    下载时按 URL 中的 sha256 边下边校验，通过后清单标记 verified；已存在的旧文件
+    直接返回（由 whisper.load_model 负责 sha 校验/必要时重下）。
     返回 .pt 路径；无法处理（未知模型名）时返回 None 让后端自行下载。
     """
     import whisper
@@ -274,50 +1164,100 @@ def ensure_whisper_model(whisper_name, on_progress=None, on_start=None,
     os.makedirs(root, exist_ok=True)
     if on_start:
         on_start()
-    parallel_download(url, dest, on_progress=on_progress, connections=connections)
+    sha = whisper_sha256(whisper_name)     # 据 URL 中的摘要边下边校验
+    parallel_download(url, dest, on_progress=on_progress, connections=connections,
+                      sha256=sha)
+    try:
+        write_manifest(_whisper_manifest_path(dest), url,
+                       [(os.path.basename(dest), os.path.getsize(dest), sha)],
+                       verified=sha is not None)
+    except OSError:
+        pass
     return dest
 
 
 def ensure_mlx_model(repo_id, on_progress=None, on_start=None,
-                     connections=_DEFAULT_CONNECTIONS, endpoint=None):
+                     connections=_DEFAULT_CONNECTIONS, endpoint=None, spread=False):
     """确保指定 HF 仓库的文件已下到本地目录，返回该目录供 mlx_whisper 离线加载。
 
-    endpoint：HF 端点，传 'https://hf-mirror.com' 走国内镜像；None 为官方。
+    endpoint：HF 端点，传 'https://hf-mirror.com' 走国内镜像；None 为官方；
+    'auto' 时对 HF_ENDPOINTS 测速，按快慢排序作为镜像列表交给 download_many
+    （spread=True 时同时从多个端点取分块）。
     任何失败应由调用方捕获并回退到传 repo id 让后端自行下载。
     """
+    target_dir = mlx_cache_dir(repo_id)
+    manifest = read_manifest(_mlx_manifest_path(repo_id))
+    if manifest is not None and not manifest.get('backfilled'):
+        return target_dir  # 清单有效：已完整下载，无需查询远端
+
     from huggingface_hub import HfApi, hf_hub_url
 
-    target_dir = mlx_cache_dir(repo_id)
-    info = HfApi(endpoint=endpoint).model_info(repo_id, files_metadata=True)
+    endpoints = [endpoint]
+    if endpoint == 'auto':
+        probes = [hf_hub_url(repo_id, 'config.json', endpoint=ep) for ep in HF_ENDPOINTS]
+        ranked = rank_mirrors(probes)
+        endpoints = ([HF_ENDPOINTS[probes.index(u)] for u in ranked]
+                     + [ep for ep, u in zip(HF_ENDPOINTS, probes) if u not in ranked])
+    info, err = None, None
+    for ep in endpoints:
+        try:
+            info = HfApi(endpoint=ep).model_info(repo_id, files_metadata=True)
+            break
+        except Exception as e:  # noqa: BLE001 - 换下一个端点
+            err = e
+    if info is None:
+        raise err
     sibs = [(s.rfilename, int(getattr(s, 'size', 0) or 0)) for s in info.siblings]
+    shas = {s.rfilename: _lfs_sha256(s) for s in info.siblings}
 
     def ok(fn, sz):
         p = os.path.join(target_dir, fn)
         return os.path.exists(p) and (sz == 0 or os.path.getsize(p) == sz)
 
+    def record(verified=False):
+        try:
+            write_manifest(_mlx_manifest_path(repo_id), repo_id,
+                           [(fn, os.path.getsize(os.path.join(target_dir, fn)), shas.get(fn))
+                            for fn, _ in sibs], verified=verified)
+        except OSError:
+            pass
+
     if sibs and all(ok(fn, sz) for fn, sz in sibs):
-        return target_dir  # 已缓存
+        record()
+        return target_dir  # 已缓存（旧下载只核对过大小）
 
     total = sum(sz for _, sz in sibs) or 0
     if on_start:
         on_start()
 
     base = 0
+    verified = True     # 所有带 LFS sha256 的文件都在本次下载中校验过
+    items = []
     for fn, sz in sibs:
         dest = os.path.join(target_dir, fn)
         os.makedirs(os.path.dirname(dest), exist_ok=True)
         if ok(fn, sz):
             base += sz
+            verified = verified and shas.get(fn) is None
             continue
-        url = hf_hub_url(repo_id, fn, endpoint=endpoint)
-        b0 = base
+        items.append(([hf_hub_url(repo_id, fn, endpoint=ep) for ep in endpoints],
+                      dest, shas.get(fn)))
 
-        def cb(done, _t, speed, _b0=b0):
-            if on_progress:
-                on_progress(_b0 + done, total or (_b0 + done), speed)
+    def cb(done, _t, speed, conns=None):
+        if on_progress:
+            on_progress(base + done, total or (base + done), speed, conns)
 
-        parallel_download(url, dest, on_progress=cb if on_progress else None,
-                          connections=connections)
-        base += sz
+    # 所有缺失文件进同一个分块队列：配置 / 分词表等小文件与权重重叠下载
+    download_many(items, on_progress=cb if on_progress else None, connections=connections,
+                  spread=spread)
 
+    record(verified)
     return target_dir
+
+
+def _lfs_sha256(sibling):
+    """HF 仓库文件的 LFS sha256（非 LFS 小文件返回 None）。"""
+    lfs = getattr(sibling, 'lfs', None)
+    if lfs is None:
+        return None
+    return lfs.get('sha256') if isinstance(lfs, dict) else getattr(lfs, 'sha256', None)
@@ -6,13 +6,12 @@
 - 模型在首次使用时按需下载（不随包封装）。
 - 支持多文件批量、语言/任务选择、模型缓存、确定性进度（尽力而为）、
   以及可选导出 Apple .itt。
+- 转录核心在 transcriber.py（不依赖 Qt），本文件只负责界面与线程封装。
 """
 import os
-import re
 import sys
-import shutil
-import tempfile
 import platform
+import multiprocessing
 import time
 
 from pathlib import Path
@@ -24,74 +23,14 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt5.QtGui import QIcon
 
-import srt2itt
 import downloader
-
-# 支持的音频与视频扩展名（基于 ffmpeg 常见可解码格式）
-SUPPORTED_AUDIO_EXTENSIONS = {
-    '.aac', '.aiff', '.alac', '.amr', '.flac', '.m4a', '.mp3',
-    '.ogg', '.opus', '.wav', '.wma',
-}
-SUPPORTED_VIDEO_EXTENSIONS = {
-    '.avi', '.flv', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg',
-    '.mpg', '.ts', '.webm', '.wmv',
-}
-SUPPORTED_EXTENSIONS = SUPPORTED_AUDIO_EXTENSIONS.union(SUPPORTED_VIDEO_EXTENSIONS)
-
-# 语言下拉项：(whisper 语言码或 None, 显示名)
-LANGUAGES = [
-    (None, '自动检测'),
-    ('zh', '中文'),
-    ('en', '英语'),
-    ('ja', '日语'),
-    ('ko', '韩语'),
-    ('yue', '粤语'),
-    ('es', '西班牙语'),
-    ('fr', '法语'),
-    ('de', '德语'),
-    ('ru', '俄语'),
-    ('it', '意大利语'),
-    ('pt', '葡萄牙语'),
-    ('ar', '阿拉伯语'),
-    ('hi', '印地语'),
-    ('th', '泰语'),
-    ('vi', '越南语'),
-]
-
-# 模型注册表：id, 显示名, MLX 仓库(Apple Silicon), whisper 名(其余平台), 约大小(MB)
-# 注意 turbo 系列仓库名不遵循 whisper-{size}-mlx 规则，需在此显式映射。
-MODELS = [
-    ('large-v3-turbo', '⚡ Large V3 Turbo（推荐 · 又快又准）',
-     'mlx-community/whisper-large-v3-turbo', 'large-v3-turbo', 1600),
-    ('large-v3', 'Large V3（最高准确度 · 较慢）',
-     'mlx-community/whisper-large-v3-mlx', 'large-v3', 3100),
-    ('medium', 'Medium（中型）',
-     'mlx-community/whisper-medium-mlx', 'medium', 1500),
-    ('small', 'Small（小型）',
-     'mlx-community/whisper-small-mlx', 'small', 480),
-    ('base', 'Base（基础）',
-     'mlx-community/whisper-base-mlx', 'base', 145),
-    ('tiny', 'Tiny（最快 · 准确度低）',
-     'mlx-community/whisper-tiny-mlx', 'tiny', 75),
-]
-
-_MODEL_BY_ID = {m[0]: m for m in MODELS}
-
-
-def model_mlx_repo(model_id):
-    return _MODEL_BY_ID[model_id][2]
-
-
-def model_whisper_name(model_id):
-    return _MODEL_BY_ID[model_id][3]
-
-
-def model_approx_mb(model_id):
-    return _MODEL_BY_ID[model_id][4]
-
-
-def is_apple_silicon():
-    return platform.system() == 'Darwin' and platform.machine() == 'arm64'
+from result_cache import ResultCache
+from transcriber import (  # noqa: F401 - 部分名称供外部脚本沿用 main.xxx 访问
+    SUPPORTED_AUDIO_EXTENSIONS, SUPPORTED_VIDEO_EXTENSIONS, SUPPORTED_EXTENSIONS,
+    LANGUAGES, MODELS, _MODEL_BY_ID, model_mlx_repo, model_whisper_name, model_approx_mb,
+    is_apple_silicon, setup_ffmpeg, have_ffmpeg, format_timestamp, generate_srt,
+    import_backend, Transcriber, _PREFETCH_FILES, _BATCH_FILES, MODEL_CACHE,
+)
 
 
 def resource_path(rel):
@@ -100,312 +39,39 @@ def resource_path(rel):
     return os.path.join(base, rel)
 
 
-# ----------------------------- ffmpeg 注入 -----------------------------
-
-_FFMPEG_PATH = None
-
-
-def setup_ffmpeg():
-    """把随包的 ffmpeg 暴露为 PATH 中名为 `ffmpeg` 的可执行文件。
-
-    imageio-ffmpeg 自带的二进制名形如 `ffmpeg-macos-arm64-vX`，而 whisper /
-    mlx_whisper 内部以 `ffmpeg` 调用子进程，故把它复制成一个名为 ffmpeg 的真实文件
-    放到稳定的缓存目录，并把该目录前置到 PATH。
-
-    用「复制」而非「软链」很关键：macOS 的 App Translocation 会让 .app 每次从不同
-    的随机临时路径运行，旧的软链会指向已消失的路径而失效，导致回退后 PATH 里只有名为
-    `ffmpeg-macos-...` 的二进制，whisper 以 `ffmpeg` 调用时报 “No such file”。复制出
-    的真实文件不受其影响；按大小判断复用，仅首次复制。
-    """
-    global _FFMPEG_PATH
-    src = None
-    try:
-        import imageio_ffmpeg
-        src = imageio_ffmpeg.get_ffmpeg_exe()
-    except Exception:
-        src = None
-    if not src or not os.path.exists(src):
-        _FFMPEG_PATH = shutil.which('ffmpeg')
-        if _FFMPEG_PATH:
-            os.environ['PATH'] = (os.path.dirname(_FFMPEG_PATH) + os.pathsep
-                                  + os.environ.get('PATH', ''))
-        return _FFMPEG_PATH
-
-    bindir = os.path.join(os.path.expanduser('~/.cache/srtgen'), 'bin')
-    name = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg'
-    target = os.path.join(bindir, name)
-    try:
-        os.makedirs(bindir, exist_ok=True)
-        reuse = (os.path.isfile(target) and not os.path.islink(target)
-                 and os.path.getsize(target) == os.path.getsize(src))
-        if not reuse:
-            if os.path.islink(target) or os.path.exists(target):
-                try:
-                    os.remove(target)
-                except OSError:
-                    pass
-            shutil.copy2(src, target)
-            os.chmod(target, 0o755)
-        _FFMPEG_PATH = target
-        os.environ['PATH'] = bindir + os.pathsep + os.environ.get('PATH', '')
-    except Exception:
-        # 退路：直接用 imageio 二进制目录（名字可能不符，但聊胜于无）
-        _FFMPEG_PATH = src
-        os.environ['PATH'] = os.path.dirname(src) + os.pathsep + os.environ.get('PATH', '')
-    return _FFMPEG_PATH
-
-
-def have_ffmpeg():
-    return bool(_FFMPEG_PATH) or shutil.which('ffmpeg') is not None
-
-
-# ----------------------------- 进度补丁（尽力而为） -----------------------------
-
-class _ProgressReporter:
-    """承载当前转录的进度回调（单转录串行执行，全局即可）。"""
-    callback = None
-
-
-class _TqdmShim:
-    """替换 whisper/mlx_whisper.transcribe 内部 tqdm 的安全垫片。
-
-    支持 `tqdm(...)` 与 `tqdm.tqdm(...)` 两种调用形态，并对未知属性返回空操作，
-    确保即便上游内部结构有变化也不会破坏转录本身。
-    """
-
-    class _Bar:
-        def __init__(self, iterable=None, total=None, **kw):
-            self.iterable = iterable
-            self.total = total
-            self.n = 0
-
-        def update(self, k=1):
-            self.n += k
-            cb = _ProgressReporter.callback
-            if cb and self.total:
-                try:
-                    cb(max(0.0, min(1.0, self.n / float(self.total))))
-                except Exception:
-                    pass
-
-        def __enter__(self):
-            return self
-
-        def __exit__(self, *a):
-            return False
-
-        def __iter__(self):
-            for obj in (self.iterable or []):
-                yield obj
-                self.update(1)
-
-        def __getattr__(self, _name):
-            return lambda *a, **k: None
-
-    # 同时支持 shim(...) 与 shim.tqdm(...)
-    tqdm = _Bar
-
-    def __call__(self, *a, **k):
-        return _TqdmShim._Bar(*a, **k)
-
-
-def _install_progress_patch(module_name):
-    """把指定 *.transcribe 模块的 tqdm 替换为垫片，返回还原函数。"""
-    mod = sys.modules.get(module_name + '.transcribe')
-    if mod is None or getattr(mod, 'tqdm', None) is None:
-        return lambda: None
-    original = mod.tqdm
-    mod.tqdm = _TqdmShim()
-
-    def restore():
-        mod.tqdm = original
-
-    return restore
-
-
-# ----------------------------- 模型缓存 -----------------------------
-
-_WHISPER_MODEL_CACHE = {}
-
-
-def _get_whisper_model(whisper, size, device):
-    key = (size, device)
-    model = _WHISPER_MODEL_CACHE.get(key)
-    if model is None:
-        model = whisper.load_model(size, device=device)
-        _WHISPER_MODEL_CACHE[key] = model
-    return model
-
-
-# ----------------------------- SRT 生成 -----------------------------
-
-def format_timestamp(seconds):
-    seconds = max(0.0, float(seconds))
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int(round((seconds - int(seconds)) * 1000))
-    if millis == 1000:
-        millis = 0
-        secs += 1
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-
-
-def generate_srt(segments):
-    parts = []
-    for i, segment in enumerate(segments, 1):
-        start = format_timestamp(float(segment['start']))
-        end = format_timestamp(float(segment['end']))
-        text = segment['text'].strip()
-        parts.append(f"{i}\n{start} --> {end}\n{text}\n")
-    return "\n".join(parts) + ("\n" if parts else "")
-
-
 # ----------------------------- 转录线程 -----------------------------
 
 class Worker(QThread):
+    """把 transcriber.Transcriber 的回调转成 Qt 信号，在后台线程运行整批转录。"""
     result = pyqtSignal(object)          # 最终结果（list 或错误 str）
     progress = pyqtSignal(str)           # 状态文本
     progress_pct = pyqtSignal(int)       # 0..100，转录进度（可能不触发）
     started_task = pyqtSignal(str)       # downloading / loading / transcribing
 
-    def __init__(self, file_paths, model_size, device, language, task, export_itt, endpoint=None):
+    def __init__(self, file_paths, model_size, device, language, task, export_itt, endpoint=None,
+                 prefetch=_PREFETCH_FILES, use_vad=False, batch_size=1, workers=1):
         super().__init__()
         self.file_paths = list(file_paths)
-        self.model_size = model_size
-        self.device = device
-        self.language = language        # None 表示自动检测
-        self.task = task                # 'transcribe' / 'translate'
-        self.export_itt = export_itt
-        self.endpoint = endpoint        # HF 下载端点（镜像）
-
-    def _emit_pct(self, fraction):
-        self.progress_pct.emit(int(fraction * 100))
-
-    def _on_download_start(self):
-        self.started_task.emit('downloading')
-
-    def _on_download_progress(self, done, total, speed):
-        """下载进度回调（节流到约 5 次/秒），显示百分比 + 速度 + 大小。"""
-        now = time.time()
-        if now - getattr(self, '_last_dl_emit', 0) < 0.2 and total and done < total:
-            return
-        self._last_dl_emit = now
-        mb = 1 << 20
-        pct = int(done / total * 100) if total else 0
-        self.progress_pct.emit(pct)
-        self.progress.emit(
-            f'下载模型 {pct}% · {speed / mb:.1f} MB/s · {done // mb}/{(total or done) // mb} MB')
-
-    def _transcribe_one(self, backend, path, apple, model_holder):
-        """转录单个文件，返回 whisper 风格 result dict。"""
-        if apple:
-            # 多线程下载模型（带进度/速度），失败回退到传 repo id 让后端自行下载
-            repo = model_mlx_repo(self.model_size)
-            try:
-                local = downloader.ensure_mlx_model(
-                    repo,
-                    on_progress=self._on_download_progress,
-                    on_start=self._on_download_start,
-                    endpoint=self.endpoint)
-                if local:
-                    repo = local
-            except Exception:
-                repo = model_mlx_repo(self.model_size)
-            self.started_task.emit('transcribing')
-            self.progress.emit('正在转录...')
-            self.progress_pct.emit(0)
-            restore = _install_progress_patch('mlx_whisper')
-            _ProgressReporter.callback = self._emit_pct
-            try:
-                return backend.transcribe(
-                    path,
-                    path_or_hf_repo=repo,
-                    language=self.language,
-                    task=self.task,
-                    verbose=False,  # 启用内部 tqdm，供进度垫片捕获
-                )
-            finally:
-                _ProgressReporter.callback = None
-                restore()
-        else:
-            if model_holder.get('model') is None:
-                wname = model_whisper_name(self.model_size)
-                try:
-                    downloader.ensure_whisper_model(
-                        wname,
-                        on_progress=self._on_download_progress,
-                        on_start=self._on_download_start)
-                except Exception:
-                    pass  # 回退到 whisper.load_model 自带下载
-                self.started_task.emit('loading')
-                self.progress.emit('正在加载模型...')
-                model_holder['model'] = _get_whisper_model(backend, wname, self.device)
-            self.started_task.emit('transcribing')
-            self.progress.emit('正在转录...')
-            self.progress_pct.emit(0)
-            restore = _install_progress_patch('whisper')
-            _ProgressReporter.callback = self._emit_pct
-            try:
-                return model_holder['model'].transcribe(
-                    path,
-                    language=self.language,
-                    task=self.task,
-                    verbose=False,
-                )
-            finally:
-                _ProgressReporter.callback = None
-                restore()
+        # workers > 1 时（仅 CPU / int8）多个文件分给多个转录进程并行（见 transcribe_pool）
+        self.engine = Transcriber(
+            model_size, device, language, task, export_itt, endpoint=endpoint,
+            prefetch=prefetch, use_vad=use_vad, cache=ResultCache(), batch_size=batch_size,
+            workers=workers,
+            on_status=self.progress.emit,
+            on_pct=self.progress_pct.emit,
+            on_task=self.started_task.emit,
+        )
 
     def run(self):
         try:
-            apple = is_apple_silicon()
-            if apple:
-                import mlx_whisper as backend
-            else:
-                import whisper as backend
+            _apple, backend = import_backend()
         except Exception as e:
             self.result.emit(f'错误：加载转录引擎失败：{e}')
             return
-
-        results = []
-        model_holder = {'model': None}
-        total = len(self.file_paths)
-
-        for idx, path in enumerate(self.file_paths, 1):
-            base = os.path.basename(path)
-            if not os.path.exists(path):
-                results.append((path, None, '文件不存在'))
-                continue
-            if Path(path).suffix.lower() not in SUPPORTED_EXTENSIONS:
-                results.append((path, None, '不支持的文件格式'))
-                continue
-
-            if total > 1:
-                self.progress.emit(f'处理中 {idx}/{total}：{base}')
-
-            try:
-                res = self._transcribe_one(backend, path, apple, model_holder)
-                segments = res.get('segments') if isinstance(res, dict) else None
-                if not segments:
-                    raise ValueError('未能生成有效的字幕分段')
-
-                srt_content = generate_srt(segments)
-                srt_path = str(Path(path).with_suffix('.srt'))
-                with open(srt_path, 'w', encoding='utf-8') as f:
-                    f.write(srt_content)
-
-                itt_path = None
-                if self.export_itt:
-                    itt_path = str(Path(path).with_suffix('.itt'))
-                    detected = res.get('language') if isinstance(res, dict) else None
-                    srt2itt.convert_srt_to_itt(
-                        srt_path, itt_path, lang=(self.language or detected or 'zh'))
-
-                results.append((path, srt_path, None))
-            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
-                results.append((path, None, str(e)))
-
+        try:
+            results = self.engine.run(self.file_paths, backend)
+        except Exception as e:  # noqa: BLE001 - 必须回传结果，否则界面一直处于忙碌态
+            results = f'错误：转录失败：{e}'
         self.result.emit(results)
 
 
@@ -423,7 +89,7 @@ class DownloadWorker(QThread):
         self.endpoint = endpoint
         self._last_emit = 0.0
 
-    def _on_progress(self, done, total, speed):
+    def _on_progress(self, done, total, speed, conns=None):
         now = time.time()
         if now - self._last_emit < 0.2 and total and done < total:
             return
@@ -432,7 +98,8 @@ class DownloadWorker(QThread):
         pct = int(done / total * 100) if total else 0
         self.progress_pct.emit(pct)
         self.progress.emit(
-            f'下载中 {pct}% · {speed / mb:.1f} MB/s · {done // mb}/{(total or done) // mb} MB')
+            f'下载中 {pct}% · {speed / mb:.1f} MB/s · {done // mb}/{(total or done) // mb} MB'
+            + (f' · {sum(1 for c in conns if c["alive"])} 连接' if conns else ''))
 
     def run(self):
         try:
@@ -586,20 +253,42 @@ class SubtitleGenerator(QMainWindow):
             if self.check_cuda():
                 self.device_selector.addItem('CUDA（GPU 加速）', 'cuda')
             self.device_selector.addItem('CPU', 'cpu')
+            self.device_selector.addItem('CPU int8 量化（更快 · 略降准确度）', 'quantized')
         else:
             self.device_selector.addItem('MLX（Apple Silicon）', 'mlx')
             self.device_selector.setEnabled(False)
         layout.addLayout(self._field_row('设备', self.device_selector))
 
+        # 转录进程数：只对 CPU / int8 生效，多个文件并行转录（每进程各占一份线程）
+        self.workers_selector = QComboBox(self)
+        self.workers_selector.addItem('1 个（逐个转录）', 1)
+        cores = os.cpu_count() or 1
+        for n in (2, 4, 8):
+            if n <= cores:
+                self.workers_selector.addItem(f'{n} 个（多文件并行）', n)
+        if not is_apple_silicon():
+            self.device_selector.currentIndexChanged.connect(self._update_workers_selector)
+            self._update_workers_selector()
+            layout.addLayout(self._field_row('进程', self.workers_selector))
+
         # 下载源（镜像可大幅提升国内下载速度；只影响 Apple Silicon 的模型下载）
         self.source_selector = QComboBox(self)
-        self.source_selector.addItem('国内镜像 hf-mirror.com（推荐）', 'https://hf-mirror.com')
+        self.source_selector.addItem('自动（测速选择最快的源）', 'auto')
+        self.source_selector.addItem('国内镜像 hf-mirror.com', 'https://hf-mirror.com')
         self.source_selector.addItem('官方 HuggingFace', None)
         layout.addLayout(self._field_row('下载源', self.source_selector))
 
         self.itt_checkbox = QCheckBox('同时导出 Apple .itt 字幕', self)
         layout.addWidget(self.itt_checkbox)
 
+        self.vad_checkbox = QCheckBox('跳过静音段（VAD，加快转录、减少幻听）', self)
+        layout.addWidget(self.vad_checkbox)
+
+        # 批量解码只用于 openai-whisper；结果可能与逐个转录略有差异，默认关闭
+        self.batch_checkbox = QCheckBox('短音频批量解码（大量短片段时更快，结果可能略有差异）', self)
+        self.batch_checkbox.setVisible(not is_apple_silicon())
+        layout.addWidget(self.batch_checkbox)
+
         self.generate_button = QPushButton('生成字幕', self)
         self.generate_button.setObjectName('primary')
         self.generate_button.clicked.connect(self.generate_subtitle)
@@ -683,6 +372,8 @@ class SubtitleGenerator(QMainWindow):
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply != QMessageBox.Yes:
             return
+        # 先卸载常驻的模型：Windows 上仍被 mmap 的权重文件无法删除
+        MODEL_CACHE.clear()
         try:
             freed = downloader.delete_model_cache(
                 is_apple_silicon(), model_mlx_repo(mid), model_whisper_name(mid))
@@ -691,6 +382,12 @@ class SubtitleGenerator(QMainWindow):
             self.status_label.setText(f'删除失败：{e}')
         self.update_cache_status()
 
+    def _update_workers_selector(self):
+        cpu = self.device_selector.currentData() in ('cpu', 'quantized')
+        self.workers_selector.setEnabled(cpu)
+        if not cpu:
+            self.workers_selector.setCurrentIndex(0)
+
     def _set_busy(self, busy):
         self._busy = busy
         self.generate_button.setDisabled(busy)
@@ -794,6 +491,9 @@ class SubtitleGenerator(QMainWindow):
             self.task_selector.currentData(),
             self.itt_checkbox.isChecked(),
             self.source_selector.currentData(),
+            use_vad=self.vad_checkbox.isChecked(),
+            batch_size=_BATCH_FILES if self.batch_checkbox.isChecked() else 1,
+            workers=self.workers_selector.currentData(),
         )
         self.worker.result.connect(self.on_result)
         self.worker.progress.connect(self.update_progress)
@@ -981,6 +681,7 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()    # 打包后的多进程转录池（spawn）需要
     if '--selftest' in sys.argv:
         sys.exit(selftest())
     if '--transcribe' in sys.argv:
@@ -0,0 +1,166 @@
+"""按内存 / 显存预算做 LRU 淘汰的进程内模型缓存。
+
+同一会话里在 large-v3、medium、turbo 之间切换时，旧做法把每个用过的模型一直留到
+进程退出，CUDA 上很快占满显存。这里按设备类别（cpu / cuda / mlx）各设一个预算：
+
+- 加载前按模型估算占用，先淘汰最久未用的模型腾出空间；加载后按实际参数字节数记账；
+- 淘汰时丢弃引用、gc，并显式释放设备缓存（torch.cuda.empty_cache / mlx 缓存）；
+- 记录命中 / 未命中 / 淘汰次数与每个模型的加载耗时，供状态栏与批处理汇总显示。
+
+预算默认：CUDA 为显存的 85%，cpu / mlx 为物理内存的一半；环境变量
+SRTGEN_MODEL_BUDGET_MB 或 set_budget 可覆盖。至少保留最近使用的一个模型。
+"""
+import gc
+import os
+import time
+import threading
+from collections import OrderedDict
+
+_CUDA_SHARE = 0.85
+_RAM_SHARE = 0.5
+_FALLBACK_RAM = 8 << 30
+
+
+def device_kind(device):
+    """'cuda:1' → 'cuda'、'quantized' → 'cpu'；预算按设备类别统计。"""
+    kind = str(device or 'cpu').split(':', 1)[0]
+    return 'cpu' if kind == 'quantized' else kind
+
+
+def _physical_ram():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return _FALLBACK_RAM
+
+
+def default_budget(kind):
+    """设备类别的默认预算（字节）。"""
+    env = os.environ.get('SRTGEN_MODEL_BUDGET_MB')
+    if env and env.isdigit():
+        return int(env) << 20
+    if kind == 'cuda':
+        try:
+            import torch
+            return int(torch.cuda.get_device_properties(0).total_memory * _CUDA_SHARE)
+        except Exception:
+            return _FALLBACK_RAM
+    return int(_physical_ram() * _RAM_SHARE)
+
+
+def footprint(model):
+    """模型参数与缓冲的字节数（torch 模块或 MLX 模块）；无法统计时返回 0。"""
+    try:
+        import torch
+        if isinstance(model, torch.nn.Module):
+            tensors = list(model.parameters()) + list(model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors if not t.is_meta)
+    except ImportError:
+        pass
+    try:
+        from mlx.utils import tree_flatten
+        return sum(v.nbytes for _, v in tree_flatten(model.parameters()))
+    except Exception:
+        return 0
+
+
+def _release_device(kind):
+    gc.collect()
+    if kind == 'cuda':
+        try:
+            import torch
+            torch.cuda.empty_cache()
+        except Exception:
+            pass
+    elif kind == 'mlx':
+        try:
+            import mlx.core as mx
+            clear = getattr(mx, 'clear_cache', None) or mx.metal.clear_cache
+            clear()
+        except Exception:
+            pass
+
+
+class ModelCache:
+    """key → 已加载模型的 LRU 缓存，按设备类别分别受预算约束。"""
+
+    def __init__(self, budgets=None):
+        self._budgets = dict(budgets or {})
+        self._entries = OrderedDict()   # key -> [model, kind, bytes, load_s, on_evict]
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.evictions = 0
+        self.load_s = 0.0
+        self.last = (None, False, 0.0)  # 最近一次 get：(key, 是否命中, 加载耗时)
+
+    def budget(self, kind):
+        if kind not in self._budgets:
+            self._budgets[kind] = default_budget(kind)
+        return self._budgets[kind]
+
+    def set_budget(self, kind, nbytes):
+        """调整某设备类别的预算（字节），超出的部分立即淘汰。"""
+        with self._lock:
+            self._budgets[kind] = int(nbytes)
+            self._evict(kind, 0)
+
+    def used(self, kind):
+        return sum(e[2] for e in self._entries.values() if e[1] == kind)
+
+    def get(self, key, loader, device, estimate=0, on_evict=None):
+        """取缓存的模型；未命中时先按 estimate 腾出空间，再调用 loader() 加载。
+
+        on_evict(model) 在该模型被淘汰时调用（用于清理外部对它的引用）。
+        """
+        kind = device_kind(device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.last = (key, True, 0.0)
+                return entry[0]
+            self.misses += 1
+            self._evict(kind, estimate)
+            t0 = time.perf_counter()
+            model = loader()
+            load_s = time.perf_counter() - t0
+            self.load_s += load_s
+            self.last = (key, False, load_s)
+            self._entries[key] = [model, kind, footprint(model) or estimate, load_s, on_evict]
+            self._evict(kind, 0, keep=key)
+            return model
+
+    def _evict(self, kind, incoming, keep=None):
+        """淘汰 kind 类别最久未用的模型，直到已用 + incoming 不超预算（至少保留 keep）。"""
+        budget = self.budget(kind)
+        freed = False
+        for key in [k for k, e in self._entries.items() if e[1] == kind and k != keep]:
+            if self.used(kind) + incoming <= budget:
+                break
+            model, _, _, _, on_evict = self._entries.pop(key)
+            if on_evict is not None:
+                try:
+                    on_evict(model)
+                except Exception:
+                    pass
+            del model
+            self.evictions += 1
+            freed = True
+        if freed:
+            _release_device(kind)
+
+    def clear(self):
+        with self._lock:
+            for kind in {e[1] for e in self._entries.values()}:
+                self.set_budget(kind, 0)
+            self._budgets.clear()
+
+    def stats(self):
+        """命中统计与当前常驻模型：{'hits', 'misses', 'evictions', 'load_s', 'models': [...]}。"""
+        with self._lock:
+            return {
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'load_s': round(self.load_s, 3),
+                'models': [{'key': str(k), 'device': e[1], 'mb': e[2] >> 20,
+                            'load_s': round(e[3], 3)} for k, e in self._entries.items()],
+            }
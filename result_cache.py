@@ -0,0 +1,167 @@
+"""转录结果缓存（按内容寻址，持久化在 ~/.cache/srtgen/results）。
+
+同一媒体文件以相同 模型 / 语言 / 任务（及 VAD、切块选项）重跑时直接复用上次的分段，
+SRT / ITT 可瞬间重新生成，且命中时不解码、不加载模型。
+
+- 键：媒体快速指纹（大小 + mtime + 头 / 尾 / 中间均匀采样的若干块）与转录参数的
+  BLAKE2b 摘要，不读全文件，GB 级视频也是毫秒级；
+- 值：紧凑 JSON（语言 + [start, end, text] 列表），原子写入；
+- 容量：总大小超过上限时按最近使用时间（命中会刷新 mtime）淘汰最旧的条目。
+
+所有异常都在内部吞掉：缓存只是加速层，读写失败等同未命中。
+"""
+import os
+import json
+import hashlib
+import threading
+
+_ROOT = os.path.join(os.path.expanduser('~/.cache/srtgen'), 'results')
+_DEFAULT_MAX_BYTES = 256 << 20     # 256 MiB：约数万小时的字幕分段
+_SAMPLE_BYTES = 64 << 10           # 每个采样块 64 KiB
+_SAMPLE_BLOCKS = 8                 # 头、尾与中间均匀分布的采样块数
+_FORMAT = 1                        # 值格式版本：变更后旧条目自然失效
+
+
+def media_fingerprint(path):
+    """媒体文件快速指纹：大小、mtime 与若干采样块的 BLAKE2b。"""
+    st = os.stat(path)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f'{st.st_size}:{st.st_mtime_ns}'.encode())
+    with open(path, 'rb') as f:
+        if st.st_size <= _SAMPLE_BYTES * _SAMPLE_BLOCKS:
+            h.update(f.read())
+        else:
+            span = st.st_size - _SAMPLE_BYTES
+            for i in range(_SAMPLE_BLOCKS):
+                f.seek(span * i // (_SAMPLE_BLOCKS - 1))
+                h.update(f.read(_SAMPLE_BYTES))
+    return h.hexdigest()
+
+
+def cache_key(path, model_id, language, task, **options):
+    """由媒体指纹与转录参数得到缓存键；options 中为 None / False 的项不参与。"""
+    parts = [f'v{_FORMAT}', media_fingerprint(path), model_id, language or 'auto', task]
+    parts += [f'{k}={v}' for k, v in sorted(options.items()) if v not in (None, False)]
+    return hashlib.blake2b('|'.join(parts).encode(), digest_size=20).hexdigest()
+
+
+class ResultCache:
+    """按键存取 whisper 风格结果（仅保留 language 与分段的 start/end/text）。"""
+
+    def __init__(self, root=None, max_bytes=_DEFAULT_MAX_BYTES):
+        self.root = root or _ROOT
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None              # 目录总大小，首次写入时统计一次后增量维护
+
+    def _path(self, key):
+        return os.path.join(self.root, key + '.json')
+
+    def get(self, key):
+        """命中返回 {'language', 'segments': [...]}，否则 None。
+
+        条目损坏（不是合法 JSON，或结构不对）视为未命中并删除。
+        """
+        p = self._path(key)
+        try:
+            with open(p, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except OSError:
+            return None
+        except ValueError:
+            self._discard(p)
+            return None
+        try:
+            res = {
+                'language': data.get('language'),
+                'segments': [{'id': i, 'start': float(s), 'end': float(e), 'text': str(t)}
+                             for i, (s, e, t) in enumerate(data.get('segments') or [])],
+            }
+        except Exception:  # noqa: BLE001 - 结构不符（[]、元组长度不对等）
+            self._discard(p)
+            return None
+        try:
+            os.utime(p)                 # 刷新最近使用时间（LRU）
+        except OSError:
+            pass
+        return res
+
+    def _discard(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total is not None:
+                self._total -= size
+
+    def put(self, key, res):
+        """写入结果（原子替换），随后按容量上限淘汰。"""
+        data = {
+            'language': res.get('language'),
+            'segments': [[round(float(s['start']), 3), round(float(s['end']), 3), s['text']]
+                         for s in res.get('segments') or []],
+        }
+        p = self._path(key)
+        tmp = f'{p}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            size = os.path.getsize(tmp)
+            os.replace(tmp, p)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._total is None:
+                self._total = sum(sz for _, sz, _ in self._entries())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.root) as it:
+                for e in it:
+                    if e.name.endswith('.json'):
+                        try:
+                            st = e.stat()
+                        except OSError:
+                            continue
+                        yield e.path, st.st_size, st.st_mtime
+        except OSError:
+            return
+
+    def _evict(self):
+        """淘汰最久未用的条目，直到总量降到上限的 90%。"""
+        entries = sorted(self._entries(), key=lambda x: x[2])
+        total = sum(sz for _, sz, _ in entries)
+        target = self.max_bytes * 9 // 10
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total = total
+
+    def clear(self):
+        """清空缓存，返回释放的字节数。"""
+        freed = 0
+        with self._lock:
+            for path, size, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                    freed += size
+                except OSError:
+                    pass
+            self._total = 0
+        return freed
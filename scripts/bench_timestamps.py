@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""时间戳格式化微基准：改造前的逐条格式化与 NumPy 批量 format_timestamps 对比。
+
+用法：
+    python scripts/bench_timestamps.py                 # 默认 200000 条字幕
+    python scripts/bench_timestamps.py -n 1000000 -r 5
+
+基线是改造前 main.py 的浮点版 format_timestamp / generate_srt（原样复制在下面），
+分别计时「只格式化时间戳」和「生成完整 SRT / ITT」两种场景。正确性另行核对：
+批量路径与整数毫秒的 subtitles.format_timestamp 逐字节一致（含毫秒舍入到 1000 的
+进位与超过 99 小时的时间）；基线在进位处本身有误（如 59.9996 → 00:00:60,000），
+只统计与其不同的条数。
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import srt2itt  # noqa: E402
+import subtitles  # noqa: E402
+from subtitles import Subtitles, format_timestamp, format_timestamps  # noqa: E402
+
+
+def make_subtitles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.uniform(0, 4 * 3600, n))
+    ends = starts + rng.uniform(0.5, 6.0, n)
+    # 边界样例：x.9995 秒（毫秒进位）、整点、超过 99 小时
+    starts[:4] = [59.9996, 3599.9995, 0.0, 360000.25]
+    texts = [f"第 {i} 条字幕 line & <{i}>" for i in range(n)]
+    return Subtitles(starts, ends, texts, language='zh')
+
+
+def baseline_format_timestamp(seconds):
+    """改造前 main.py 的 format_timestamp（原样复制）。"""
+    seconds = max(0.0, float(seconds))
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    secs = int(seconds % 60)
+    millis = int(round((seconds - int(seconds)) * 1000))
+    if millis == 1000:
+        millis = 0
+        secs += 1
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def baseline_generate_srt(segments):
+    """改造前 main.py 的 generate_srt（原样复制）。"""
+    parts = []
+    for i, segment in enumerate(segments, 1):
+        start = baseline_format_timestamp(float(segment['start']))
+        end = baseline_format_timestamp(float(segment['end']))
+        text = segment['text'].strip()
+        parts.append(f"{i}\n{start} --> {end}\n{text}\n")
+    return "\n".join(parts) + ("\n" if parts else "")
+
+
+def baseline_itt(segments, language):
+    """改造前的 ITT：逐条格式化为 SRT 时间，再由 write_itt 逐条转换。"""
+    buf = io.StringIO()
+    entries = ((baseline_format_timestamp(s['start']), baseline_format_timestamp(s['end']),
+                s['text'].strip()) for s in segments)
+    srt2itt.write_itt(entries, buf, lang=language)
+    return buf.getvalue()
+
+
+def reference_srt(subs):
+    """正确性参照：逐条调用整数毫秒的 format_timestamp。"""
+    parts = [f"{i}\n{format_timestamp(s)} --> {format_timestamp(e)}\n{t}\n"
+             for i, (s, e, t) in enumerate(subs, 1)]
+    return "\n".join(parts) + ("\n" if parts else "")
+
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("-n", type=int, default=200000, help="字幕条数（默认 %(default)s）")
+    ap.add_argument("-r", "--repeat", type=int, default=3, help="重复次数，取最快（默认 %(default)s）")
+    args = ap.parse_args()
+
+    subs = make_subtitles(args.n)
+    segments = [{'start': s, 'end': e, 'text': t} for s, e, t in subs]
+    values = np.concatenate([np.frombuffer(subs.starts), np.frombuffer(subs.ends)])
+    # 新路径含由分段构建 Subtitles 的开销（改造后各格式共用这一步）
+    cases = [
+        ("时间戳", lambda: [baseline_format_timestamp(v) for v in values.tolist()],
+         lambda: format_timestamps(values)),
+        ("SRT", lambda: baseline_generate_srt(segments),
+         lambda: subtitles.to_srt(Subtitles.from_segments(segments))),
+        ("ITT", lambda: baseline_itt(segments, subs.language),
+         lambda: subtitles.to_itt(Subtitles.from_segments(segments, subs.language))),
+    ]
+    print(f"{args.n} 条字幕，{args.repeat} 次取最快")
+    print(f"{'场景':<8}{'基线(s)':>10}{'批量(s)':>10}{'加速':>8}")
+    for name, slow, fast in cases:
+        t_slow, _ = best_of(args.repeat, slow)
+        t_fast, _ = best_of(args.repeat, fast)
+        print(f"{name:<8}{t_slow:>10.3f}{t_fast:>10.3f}{t_slow / t_fast:>7.1f}x")
+
+    batched = format_timestamps(values)
+    if batched != [format_timestamp(v) for v in values.tolist()] or \
+            subtitles.to_srt(subs) != reference_srt(subs):
+        print("批量输出与逐条整数毫秒格式化不一致")
+        return 1
+    differ = sum(a != b for a, b in zip(batched, map(baseline_format_timestamp, values.tolist())))
+    print(f"与整数毫秒逐条格式化一致；与基线不同的时间戳 {differ} 个（基线的进位错误）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@
 带有结果反馈的独立 GUI 以及命令行入口：
 
     python srt2itt.py a.srt b.srt        # 命令行批量转换
+    python srt2itt.py --jobs 8 *.srt     # 8 个进程并行转换
     python srt2itt.py                    # 打开 GUI
 
 相比旧版本修复了：
@@ -11,12 +12,25 @@
 - 仅 UTF-8 读取导致 GBK/Big5 文件崩溃；改为多编码回退。
 - 生成的 ITT 缺少 head/styling/layout/region/timeBase；改为输出合规骨架。
 - 后台线程仅 print、GUI 无反馈；改为信号回传并更新界面。
+
+convert_srt_to_itt 走流式路径（iter_srt → write_itt）：逐行读取、逐条产出字幕、
+逐个写出 <p>，几百 MB 的拼接广播字幕存档也只占常数内存。parse_srt /
+build_itt_tree 保留给需要整棵树的调用方。
+
+process_files(jobs>1) 用进程池并行转换（正则与 XML 都是 CPU 密集，按核数近线性
+扩展）：文件按 chunksize 打包成任务提交，减少进程间往返。
 """
+import argparse
+import codecs
+import multiprocessing
 import os
 import re
 import sys
 import xml.etree.ElementTree as ET
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 # 时间行：00:00:01,000 --> 00:00:03,000（毫秒分隔符容忍 , 或 .）
 _TIME_RE = re.compile(
     r"(\d{1,2}:\d{2}:\d{2}[,.]\d{1,3})\s*-->\s*(\d{1,2}:\d{2}:\d{2}[,.]\d{1,3})"
@@ -26,16 +40,140 @@ _TIME_RE = re.compile(
 # big5 覆盖繁体，latin-1 兜底（可解码任意字节）。
 _ENCODINGS = ["utf-8-sig", "utf-8", "gb18030", "big5", "cp1252", "latin-1"]
 
+_READ_BLOCK = 1 << 20
+_SAMPLE = 64 << 10          # 编码检测对头 / 中 / 尾各取的字节数
+_CJK_RUN_SHARE = 0.5        # 高位字节中处于连续高位串里的比例：低于此视为西文单字节编码
+_GB2312_SHARE = 0.85        # 双字节中落在 GB2312 汉字区的比例：高于此判为 gb18030，否则 big5
+
+_HIGH_RUN_RE = re.compile(rb"[\x80-\xff]+")
+_DBCS_PAIR_RE = re.compile(rb"[\x81-\xfe][\x40-\xfe]")
+
+# (绝对路径, 大小, mtime_ns) → 检测出的编码；批量转换时同一文件不重复检测
+_DETECTED = OrderedDict()
+_DETECTED_MAX = 4096
+
+
+def _samples(fh, size):
+    """取头 / 中 / 尾样本，返回 [(bytes, 是否到文件尾), ...]；小文件整读。
+
+    中、尾样本从第一个换行之后开始：\\n 不会是任何候选编码的多字节后续字节，
+    从这里起解码不会错位。
+    """
+    if size <= 3 * _SAMPLE:
+        return [(fh.read(), True)]
+    out = [(fh.read(_SAMPLE), False)]
+    for offset, at_end in ((size // 2 - _SAMPLE // 2, False), (size - _SAMPLE, True)):
+        fh.seek(offset)
+        chunk = fh.read(_SAMPLE)
+        out.append((chunk[chunk.find(b"\n") + 1:], at_end))
+    return out
+
+
+def _decodes(samples, enc):
+    for chunk, at_end in samples:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(chunk, final=at_end)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def _sniff(path, size):
+    """只看 BOM 与头 / 中 / 尾样本推断编码（不保证整个文件都能解码）。"""
+    with open(path, "rb") as fh:
+        samples = _samples(fh, size)
+    head = samples[0][0]
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    data = b"".join(chunk for chunk, _ in samples)
+    if data.isascii() or _decodes(samples, "utf-8"):
+        return "utf-8"
+
+    # 字节频率：中文双字节编码的高位字节成串出现；西文 cp1252 的重音字母多为孤立高位字节
+    runs = _HIGH_RUN_RE.findall(data)
+    high = sum(len(r) for r in runs)
+    in_runs = sum(len(r) for r in runs if len(r) > 1)
+    if in_runs >= high * _CJK_RUN_SHARE:
+        gb_ok, big5_ok = _decodes(samples, "gb18030"), _decodes(samples, "big5")
+        if gb_ok and big5_ok:
+            # 简体文本几乎全部落在 GB2312 汉字区（首字节 B0–F7、尾字节 A1–FE）；
+            # Big5 常用字约四成尾字节在 40–7E，落在该区的比例明显更低
+            pairs = _DBCS_PAIR_RE.findall(data)
+            gb2312 = sum(1 for a, b in pairs if 0xB0 <= a <= 0xF7 and b >= 0xA1)
+            return "gb18030" if gb2312 >= len(pairs) * _GB2312_SHARE else "big5"
+        if gb_ok or big5_ok:
+            return "gb18030" if gb_ok else "big5"
+    return "cp1252" if _decodes(samples, "cp1252") else "latin-1"
+
+
+def _scan_encoding(path):
+    """按编码回退链找出能完整解码 path 的编码（分块增量解码，常数内存）。"""
+    for enc in _ENCODINGS:
+        decoder = codecs.getincrementaldecoder(enc)()
+        try:
+            with open(path, "rb") as fh:
+                for block in iter(lambda: fh.read(_READ_BLOCK), b""):
+                    decoder.decode(block)
+            decoder.decode(b"", final=True)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def _remember(key, enc):
+    _DETECTED[key] = enc
+    _DETECTED.move_to_end(key)
+    while len(_DETECTED) > _DETECTED_MAX:
+        _DETECTED.popitem(last=False)
+    return enc
+
+
+def detect_encoding(path):
+    """推断 SRT 的编码：BOM → 样本的 UTF-8 合法性 → 字节频率判断 gb18030 / big5 / cp1252。
+
+    只读头 / 中 / 尾各一小段；结果按文件（路径、大小、mtime）缓存。样本之外若有
+    不合法字节，按该编码整读时会抛出 UnicodeDecodeError，调用方应改用 rescan_encoding。
+    """
+    key = _cache_key(path)
+    enc = _DETECTED.get(key)
+    if enc is None:
+        enc = _remember(key, _sniff(path, key[1]))
+    return enc
+
+
+def rescan_encoding(path):
+    """检测结果整读失败时：按编码回退链完整扫描，并更新缓存。"""
+    return _remember(_cache_key(path), _scan_encoding(path))
+
+
+def open_srt(path, encoding=None):
+    """以 encoding（缺省为检测结果）打开 SRT，返回逐行读取的文本流（统一换行为 \\n）。"""
+    return open(path, "r", encoding=encoding or detect_encoding(path), newline=None)
+
 
 def read_text_with_fallback(path):
-    """读取文本文件，按编码回退链尝试解码。"""
+    """读取文本文件：按检测出的编码只解码一次，失败再按编码回退链尝试。"""
     with open(path, "rb") as fh:
         raw = fh.read()
+    try:
+        return raw.decode(detect_encoding(path))
+    except UnicodeDecodeError:
+        pass
     for enc in _ENCODINGS:
         try:
-            return raw.decode(enc)
+            text = raw.decode(enc)
         except UnicodeDecodeError:
             continue
+        _remember(_cache_key(path), enc)
+        return text
     return raw.decode("utf-8", errors="replace")
 
 
@@ -45,23 +183,41 @@ def parse_srt(content):
     按空行切分字幕块，每块内定位含 `-->` 的时间行，其后的所有行为文本。
     序号行可有可无；对缺序号、多行文本、CRLF、BOM 均健壮。
     """
-    content = content.replace("\r\n", "\n").replace("\r", "\n").lstrip("﻿")
-    entries = []
-    for block in re.split(r"\n\s*\n", content.strip()):
-        lines = block.split("\n")
-        timing_idx = None
-        start = end = None
-        for i, line in enumerate(lines):
-            m = _TIME_RE.search(line)
-            if m:
-                timing_idx = i
-                start, end = m.group(1), m.group(2)
-                break
-        if timing_idx is None:
-            continue
-        text = "\n".join(lines[timing_idx + 1:]).strip()
-        entries.append((start, end, text))
-    return entries
+    content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return list(iter_srt(content.split("\n")))
+
+
+def _parse_block(lines):
+    for i, line in enumerate(lines):
+        m = _TIME_RE.search(line)
+        if m:
+            return m.group(1), m.group(2), "\n".join(lines[i + 1:]).strip()
+    return None
+
+
+def iter_srt(lines):
+    """增量解析：从逐行可迭代对象（如 open_srt 返回的文件）中逐条产出 (start, end, text)。
+
+    与 parse_srt 规则相同：空白行分隔字幕块；只缓存当前块的行。
+    """
+    block = []
+    first = True
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if first:
+            line = line.lstrip("﻿")
+            first = False
+        if line.strip():
+            block.append(line)
+        elif block:
+            entry = _parse_block(block)
+            if entry:
+                yield entry
+            block = []
+    if block:
+        entry = _parse_block(block)
+        if entry:
+            yield entry
 
 
 def _to_itt_time(srt_time):
@@ -78,6 +234,53 @@ def _set_multiline_text(p, text):
         br.tail = extra
 
 
+def _escape(text, attrib=False):
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text.replace('"', "&quot;") if attrib else text
+
+
+# 与 build_itt_tree + ET.indent 输出的骨架逐字节一致
+_ITT_HEAD = (
+    "<?xml version='1.0' encoding='utf-8'?>\n"
+    '<tt xmlns="http://www.w3.org/ns/ttml" xmlns:tts="http://www.w3.org/ns/ttml#styling"'
+    ' xmlns:ttm="http://www.w3.org/ns/ttml#metadata"'
+    ' xmlns:ttp="http://www.w3.org/ns/ttml#parameter" ttp:timeBase="media" xml:lang="{lang}">\n'
+    "  <head>\n"
+    "    <styling>\n"
+    '      <style xml:id="basic" tts:fontFamily="sansSerif" tts:fontSize="100%"'
+    ' tts:color="white" tts:textAlign="center" />\n'
+    "    </styling>\n"
+    "    <layout>\n"
+    '      <region xml:id="bottom" tts:origin="10% 80%" tts:extent="80% 20%"'
+    ' tts:displayAlign="after" tts:textAlign="center" />\n'
+    "    </layout>\n"
+    "  </head>\n"
+    "  <body>\n"
+    "    <div>\n"
+)
+_ITT_TAIL = "    </div>\n  </body>\n</tt>"
+
+
+def write_itt(entries, fh, lang="zh", srt_times=True):
+    """把 (start, end, text) 逐条写成 ITT 到文本流 fh（不构建整棵树），返回条数。
+
+    srt_times 为 False 表示 start / end 已是 ITT 的 hh:mm:ss.mmm（如 subtitles 批量
+    格式化的结果），不再逐条转换。
+    """
+    fh.write(_ITT_HEAD.format(lang=_escape(lang or "", attrib=True)))
+    count = 0
+    for start, end, text in entries:
+        if srt_times:
+            start, end = _to_itt_time(start), _to_itt_time(end)
+        body = "<br />".join(_escape(line) for line in text.split("\n"))
+        attrs = (f'begin="{_escape(start, True)}"'
+                 f' end="{_escape(end, True)}" region="bottom" style="basic"')
+        fh.write(f"      <p {attrs}>{body}</p>\n" if body else f"      <p {attrs} />\n")
+        count += 1
+    fh.write(_ITT_TAIL)
+    return count
+
+
 def build_itt_tree(entries, lang="zh"):
     """根据解析结果构建合规的 ITT ElementTree。"""
     tt = ET.Element("tt", {
@@ -121,30 +324,86 @@ def build_itt_tree(entries, lang="zh"):
     return ET.ElementTree(tt)
 
 
+def _stream_to_itt(srt_file, itt_file, lang, encoding):
+    with open_srt(srt_file, encoding) as src, \
+            open(itt_file, "w", encoding="utf-8", newline="\n") as dst:
+        return write_itt(iter_srt(src), dst, lang=lang)
+
+
 def convert_srt_to_itt(srt_file, itt_file, lang="zh"):
-    """把单个 SRT 文件转换为 ITT 文件。返回写入的字幕条数。"""
-    content = read_text_with_fallback(srt_file)
-    entries = parse_srt(content)
-    if not entries:
-        raise ValueError("未解析到任何字幕条目，请确认这是有效的 SRT 文件")
-    tree = build_itt_tree(entries, lang=lang)
-    ET.indent(tree, space="  ", level=0)
-    tree.write(itt_file, encoding="utf-8", xml_declaration=True)
-    return len(entries)
-
-
-def process_files(file_paths, lang="zh"):
-    """批量转换，返回 [(srt_path, itt_path_or_None, error_or_None), ...]。"""
-    results = []
-    for file_path in file_paths:
-        if not file_path.lower().endswith(".srt"):
-            continue
-        itt_file = os.path.splitext(file_path)[0] + ".itt"
+    """把单个 SRT 文件转换为 ITT 文件。返回写入的字幕条数。
+
+    流式：边解析边写入同目录的临时文件，完成后替换目标；无任何条目时不留下输出。
+    """
+    tmp = f"{itt_file}.{os.getpid()}.tmp"
+    try:
         try:
-            convert_srt_to_itt(file_path, itt_file, lang=lang)
-            results.append((file_path, itt_file, None))
-        except Exception as e:  # noqa: BLE001 - 汇总错误供调用方展示
-            results.append((file_path, None, str(e)))
+            count = _stream_to_itt(srt_file, tmp, lang, detect_encoding(srt_file))
+        except UnicodeDecodeError:
+            # 样本之外有该编码不合法的字节：完整扫描后重写
+            count = _stream_to_itt(srt_file, tmp, lang, rescan_encoding(srt_file))
+        if not count:
+            raise ValueError("未解析到任何字幕条目，请确认这是有效的 SRT 文件")
+        os.replace(tmp, itt_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
+
+
+_TASKS_PER_JOB = 8          # 每个进程平均分到的任务数：兼顾负载均衡与往返开销
+_MAX_CHUNK = 64
+
+
+def _convert_one(file_path, lang):
+    itt_file = os.path.splitext(file_path)[0] + ".itt"
+    try:
+        convert_srt_to_itt(file_path, itt_file, lang=lang)
+        return file_path, itt_file, None
+    except Exception as e:  # noqa: BLE001 - 汇总错误供调用方展示
+        return file_path, None, str(e)
+
+
+def _convert_chunk(indexed, lang):
+    """子进程任务：转换一组 (序号, 路径)，返回 [(序号, 结果元组), ...]。"""
+    return [(i, _convert_one(path, lang)) for i, path in indexed]
+
+
+def process_files(file_paths, lang="zh", jobs=1, on_result=None, ordered=True,
+                  chunksize=None):
+    """批量转换，返回 [(srt_path, itt_path_or_None, error_or_None), ...]（按输入顺序）。
+
+    jobs > 1 时用进程池并行（0 为 CPU 核数）。on_result(done, total, result) 在每个
+    文件完成时调用：ordered 为 True 按输入顺序回调，否则按完成顺序。
+    """
+    paths = [p for p in file_paths if p.lower().endswith(".srt")]
+    total = len(paths)
+    jobs = min(jobs or os.cpu_count() or 1, total)
+    report = on_result or (lambda *_a: None)
+    if jobs <= 1:
+        results = []
+        for path in paths:
+            results.append(_convert_one(path, lang))
+            report(len(results), total, results[-1])
+        return results
+
+    chunksize = chunksize or max(1, min(_MAX_CHUNK, total // (jobs * _TASKS_PER_JOB)))
+    indexed = list(enumerate(paths))
+    results = [None] * total
+    done = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as ex:
+        futures = {ex.submit(_convert_chunk, indexed[i:i + chunksize], lang):
+                   indexed[i:i + chunksize] for i in range(0, total, chunksize)}
+        for fut in (futures if ordered else as_completed(futures)):
+            try:
+                chunk = fut.result()
+            except Exception as e:  # noqa: BLE001 - 子进程崩溃（BrokenProcessPool 等）
+                chunk = [(i, (path, None, f"工作进程失败：{e}")) for i, path in futures[fut]]
+            for i, result in chunk:
+                results[i] = result
+                done += 1
+                report(done, total, result)
     return results
 
 
@@ -160,13 +419,16 @@ def _run_gui():
 
     class ConvertWorker(QThread):
         done = pyqtSignal(list)
+        progress = pyqtSignal(int, int)
 
         def __init__(self, file_paths):
             super().__init__()
             self.file_paths = file_paths
 
         def run(self):
-            self.done.emit(process_files(self.file_paths))
+            self.done.emit(process_files(
+                self.file_paths, jobs=0, ordered=False,
+                on_result=lambda done, total, _r: self.progress.emit(done, total)))
 
     class SRTToITTApp(QMainWindow):
         def __init__(self):
@@ -212,6 +474,8 @@ def _run_gui():
             self.select_button.setEnabled(False)
             self.label.setText(f"正在转换 {len(srt_paths)} 个文件...")
             self.worker = ConvertWorker(srt_paths)
+            self.worker.progress.connect(
+                lambda done, total: self.label.setText(f"正在转换 {done}/{total}..."))
             self.worker.done.connect(self.on_done)
             self.worker.start()
 
@@ -231,18 +495,31 @@ def _run_gui():
     sys.exit(app.exec_())
 
 
-def _run_cli(paths):
-    results = process_files(paths)
-    for srt_path, itt_path, err in results:
+def _run_cli(argv):
+    ap = argparse.ArgumentParser(description="SRT → ITT 批量转换（不带参数运行打开 GUI）。")
+    ap.add_argument("inputs", nargs="+", help="SRT 文件")
+    ap.add_argument("-j", "--jobs", type=int, default=1,
+                    help="并行转换的进程数（0 为 CPU 核数；默认 %(default)s）")
+    ap.add_argument("--lang", default="zh", help="ITT 的 xml:lang（默认 %(default)s）")
+    ap.add_argument("--unordered", action="store_true",
+                    help="按完成顺序输出结果（默认按输入顺序）")
+    args, _unknown = ap.parse_known_args(argv)  # 忽略系统附加的启动参数
+
+    def on_result(done, total, result):
+        srt_path, itt_path, err = result
         if err is None:
-            print(f"已转换: {srt_path} -> {itt_path}")
+            print(f"[{done}/{total}] 已转换: {srt_path} -> {itt_path}")
         else:
-            print(f"失败: {srt_path}: {err}", file=sys.stderr)
+            print(f"[{done}/{total}] 失败: {srt_path}: {err}", file=sys.stderr)
+
+    results = process_files(args.inputs, lang=args.lang, jobs=args.jobs,
+                            on_result=on_result, ordered=not args.unordered)
+    return 1 if any(err is not None for _, _, err in results) else 0
 
 
 if __name__ == "__main__":
-    args = [a for a in sys.argv[1:] if a.lower().endswith(".srt")]
-    if args:
-        _run_cli(args)
+    multiprocessing.freeze_support()
+    if any(a.lower().endswith(".srt") for a in sys.argv[1:]):
+        sys.exit(_run_cli(sys.argv[1:]))
     else:
         _run_gui()
@@ -0,0 +1,213 @@
+"""字幕分段的内存表示与多格式写出。
+
+转录结果（whisper 风格 segments）先转成一个紧凑的 Subtitles：起止时间放在两个
+array('d') 里，文本一个列表。各格式的写出函数都直接消费它，不必像旧做法那样
+写出 SRT 再读回、解码、正则解析才能生成 ITT。
+
+支持的格式（FORMATS）：srt、itt（Apple iTunes Timed Text，与 srt2itt 输出一致）、
+vtt（WebVTT）、ass（Advanced SubStation Alpha）、ttml、json。write_all 一次生成
+所需的全部格式。
+
+时间戳按整列批量格式化（format_timestamps）：NumPy 一次算出所有起止时间的
+时 / 分 / 秒 / 毫秒并直接拼成定宽的 ASCII 字节，不再逐条 divmod + f-string。
+"""
+import io
+import json
+from array import array
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+import srt2itt
+
+
+class Subtitles:
+    """按时间顺序的字幕条目：starts / ends（秒）与 texts（已去首尾空白）。"""
+
+    __slots__ = ('starts', 'ends', 'texts', 'language')
+
+    def __init__(self, starts=(), ends=(), texts=(), language=None):
+        self.starts = array('d', starts)
+        self.ends = array('d', ends)
+        self.texts = list(texts)
+        self.language = language
+
+    @classmethod
+    def from_segments(cls, segments, language=None):
+        """由 whisper 风格分段（含 start / end / text 的 dict）构建。"""
+        subs = cls(language=language)
+        for seg in segments:
+            subs.append(seg['start'], seg['end'], seg['text'])
+        return subs
+
+    def append(self, start, end, text):
+        self.starts.append(float(start))
+        self.ends.append(float(end))
+        self.texts.append(text.strip())
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+
+# ----------------------------- 时间格式 -----------------------------
+
+def _millis(seconds):
+    """秒 → 整毫秒（负数按 0），与旧 format_timestamp 的舍入一致。"""
+    seconds = max(0.0, float(seconds))
+    return int(seconds) * 1000 + int(round((seconds - int(seconds)) * 1000))
+
+
+def format_timestamp(seconds, sep=','):
+    """hh:mm:ss,mmm（SRT）；sep='.' 时为 WebVTT / TTML 的 hh:mm:ss.mmm。"""
+    total = _millis(seconds)
+    hours, rest = divmod(total, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    secs, millis = divmod(rest, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{sep}{millis:03d}"
+
+
+# hh:mm:ss,mmm 中各数字所在的列；其余两列是分隔符
+_DIGIT_COLS = (0, 1, 3, 4, 6, 7, 9, 10, 11)
+_STAMP_WIDTH = 12
+
+
+def format_timestamps(seconds, sep=','):
+    """批量版 format_timestamp：秒数组 → 字符串列表，舍入与进位规则完全相同。
+
+    毫秒先合成整数再拆分，round 到 1000 毫秒时自然进位到秒 / 分 / 时。
+    """
+    secs = np.maximum(np.asarray(seconds, dtype=np.float64), 0.0)
+    if not secs.size:
+        return []
+    whole = np.floor(secs)
+    total = whole.astype(np.int64) * 1000 + np.round((secs - whole) * 1000).astype(np.int64)
+    hours, rest = np.divmod(total, 3600000)
+    minutes, rest = np.divmod(rest, 60000)
+    sec, millis = np.divmod(rest, 1000)
+
+    buf = np.empty((len(total), _STAMP_WIDTH), dtype=np.uint8)
+    digits = (hours // 10 % 10, hours % 10, minutes // 10, minutes % 10, sec // 10, sec % 10,
+              millis // 100, millis // 10 % 10, millis % 10)
+    for col, values in zip(_DIGIT_COLS, digits):
+        buf[:, col] = values + ord('0')
+    buf[:, 2] = buf[:, 5] = ord(':')
+    buf[:, 8] = ord(sep)
+    text = buf.tobytes().decode('ascii')
+    out = [text[i:i + _STAMP_WIDTH] for i in range(0, len(text), _STAMP_WIDTH)]
+    for i in np.flatnonzero(hours >= 100):      # 超过两位的小时数：极少见，逐条格式化
+        out[i] = format_timestamp(secs[i], sep)
+    return out
+
+
+def _columns(subs, sep=','):
+    """所有起止时间的格式化结果 (starts, ends)。"""
+    return (format_timestamps(np.frombuffer(subs.starts, dtype=np.float64), sep),
+            format_timestamps(np.frombuffer(subs.ends, dtype=np.float64), sep))
+
+
+def _ass_time(seconds):
+    """h:mm:ss.cc（ASS 精度为百分之一秒）。"""
+    total = (_millis(seconds) + 5) // 10
+    hours, rest = divmod(total, 360000)
+    minutes, rest = divmod(rest, 6000)
+    secs, cs = divmod(rest, 100)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{cs:02d}"
+
+
+# ----------------------------- 写出 -----------------------------
+
+def to_srt(subs):
+    starts, ends = _columns(subs)
+    parts = [f"{i}\n{s} --> {e}\n{t}\n"
+             for i, (s, e, t) in enumerate(zip(starts, ends, subs.texts), 1)]
+    return "\n".join(parts) + ("\n" if parts else "")
+
+
+def to_itt(subs):
+    buf = io.StringIO()
+    starts, ends = _columns(subs, '.')
+    srt2itt.write_itt(zip(starts, ends, subs.texts), buf, lang=subs.language or 'zh',
+                      srt_times=False)
+    return buf.getvalue()
+
+
+def to_vtt(subs):
+    parts = ["WEBVTT\n"]
+    for s, e, t in zip(*_columns(subs, '.'), subs.texts):
+        # & < > 转义后文本里也不会再出现被当作时间行的「-->」
+        parts.append(f"{s} --> {e}\n{escape(t)}\n")
+    return "\n".join(parts)
+
+
+_ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, \
+Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, \
+Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,3,\
+1,2,60,60,50,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def to_ass(subs):
+    lines = [_ASS_HEADER]
+    for s, e, t in subs:
+        # { } 会被当作覆盖标签；换行写作 \N
+        text = t.replace('{', '(').replace('}', ')').replace('\n', '\\N')
+        lines.append(f"Dialogue: 0,{_ass_time(s)},{_ass_time(e)},Default,,0,0,0,,{text}\n")
+    return ''.join(lines)
+
+
+def to_ttml(subs):
+    lang = quoteattr(subs.language or '')
+    parts = ['<?xml version="1.0" encoding="utf-8"?>\n'
+             f'<tt xmlns="http://www.w3.org/ns/ttml" xml:lang={lang}>\n'
+             '  <body>\n    <div>\n']
+    for s, e, t in zip(*_columns(subs, '.'), subs.texts):
+        text = '<br/>'.join(escape(line) for line in t.split('\n'))
+        parts.append(f'      <p begin="{s}" end="{e}">{text}</p>\n')
+    parts.append('    </div>\n  </body>\n</tt>\n')
+    return ''.join(parts)
+
+
+def to_json(subs):
+    return json.dumps({
+        'language': subs.language,
+        'segments': [{'start': round(s, 3), 'end': round(e, 3), 'text': t}
+                     for s, e, t in subs],
+    }, ensure_ascii=False, indent=1) + '\n'
+
+
+# 格式 → (扩展名, 写出函数)
+FORMATS = {
+    'srt': ('.srt', to_srt),
+    'itt': ('.itt', to_itt),
+    'vtt': ('.vtt', to_vtt),
+    'ass': ('.ass', to_ass),
+    'ttml': ('.ttml', to_ttml),
+    'json': ('.json', to_json),
+}
+
+
+def write_all(subs, base, formats):
+    """把 subs 按 formats 逐一写到 base + 扩展名，返回 {格式: 路径}。"""
+    paths = {}
+    for fmt in formats:
+        ext, render = FORMATS[fmt]
+        path = base + ext
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render(subs))
+        paths[fmt] = path
+    return paths
@@ -0,0 +1,263 @@
+"""多进程转录池（openai-whisper / CPU）。
+
+单进程里 torch 的算子内并行在远少于核数的线程上就饱和了；大批量时改为开 K 个
+工作进程，每个进程持有自己的 whisper 模型，并把 CPU 核按进程均分
+（torch.set_num_threads），文件按大小从大到小动态分发（先派大文件，小文件在结尾
+填缝，避免某个进程最后独自啃一个大文件）。
+
+工作进程用 spawn 启动，只导入 transcriber / subtitles / srt2itt / downloader，不加载 Qt。
+每个文件在子进程内完成 解码 → 转录 → 写出，父进程只汇总结果与耗时。
+
+chunk_s 模式（长文件）：父进程解码并按 chunking.plan_chunks 切块，各块作为独立
+任务分给工作进程并行转录，全部返回后由 chunking.stitch 拼回再写出。这样单个
+3 小时的录音也能用满所有进程。
+"""
+import os
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import transcriber
+
+# 子进程内的单例状态：由 _init_worker 填充
+_STATE = {}
+
+
+def split_threads(workers, cores=None):
+    """把 cores 个核均分给 workers 个进程，返回每进程线程数（至少 1）。"""
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // max(1, workers))
+
+
+def _init_worker(wname, device, threads, language, task, export_itt, use_vad=False,
+                 cache_conf=None, formats=()):
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # 已有并行任务启动后不可再设，忽略
+    import whisper
+    transcriber.setup_ffmpeg()
+    _STATE.update(
+        # 权重已由父进程转换（prepare_whisper_weights）：这里只映射，不重复转换；
+        # 子进程没有状态回调，加载回退的原因写到 stderr
+        model=transcriber._get_whisper_model(
+            whisper, wname, device, convert=False,
+            on_status=lambda msg: print(f'[{os.getpid()}] {msg}', file=sys.stderr)),
+        language=language, task=task, export_itt=export_itt, use_vad=use_vad,
+        cache=_open_cache(cache_conf), formats=formats,
+    )
+
+
+def _open_cache(cache_conf):
+    if not cache_conf:
+        return None
+    import result_cache
+    root, max_bytes = cache_conf
+    return result_cache.ResultCache(root, max_bytes)
+
+
+def _transcribe_file(idx, path, key=None):
+    """子进程任务：转录单个文件并写出字幕，返回 (idx, path, srt_path, error, info)。"""
+    audio, time_map, err, info = transcriber.decode_input(path, _STATE['use_vad'])
+    info['pid'] = os.getpid()
+    if err is not None:
+        return idx, path, None, err, info
+    t1 = time.perf_counter()
+    try:
+        res = _STATE['model'].transcribe(
+            audio, language=_STATE['language'], task=_STATE['task'], verbose=None)
+        del audio
+        if time_map is not None and isinstance(res, dict):
+            time_map.remap(res)
+        segments = res.get('segments') if isinstance(res, dict) else None
+        if not segments:
+            raise ValueError('未能生成有效的字幕分段')
+        t2 = time.perf_counter()
+        info.update(transcribe_s=round(t2 - t1, 3), language=res.get('language'),
+                    segments=len(segments))
+        if key and _STATE['cache'] is not None:
+            _STATE['cache'].put(key, res)
+        srt_path, itt_path = transcriber.write_outputs(
+            path, res, _STATE['export_itt'], _STATE['language'] or res.get('language'),
+            _STATE['formats'])
+        info.update(itt=itt_path, write_s=round(time.perf_counter() - t2, 3))
+        return idx, path, srt_path, None, info
+    except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+        return idx, path, None, str(e), info
+
+
+def _transcribe_chunk(audio):
+    """子进程任务：转录一段 PCM，返回仅含拼接所需字段的 result dict。"""
+    res = _STATE['model'].transcribe(
+        audio, language=_STATE['language'], task=_STATE['task'], verbose=None)
+    return {'segments': res.get('segments') or [], 'language': res.get('language')}
+
+
+def _size_or_zero(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _run_files(ex, file_paths, order, finish, keys):
+    futures = {ex.submit(_transcribe_file, i, file_paths[i], keys[i]): i for i in order}
+    for fut in as_completed(futures):
+        idx = futures[fut]
+        try:
+            finish(*fut.result())
+        except Exception as e:  # noqa: BLE001 - 子进程崩溃（BrokenProcessPool 等）
+            finish(idx, file_paths[idx], None, f'工作进程失败：{e}', {})
+
+
+def _decode_in_order(file_paths, order, jobs, use_vad):
+    """父进程解码线程（chunk_s 模式）：按 order 解码，经有界队列交给调度循环。
+
+    单个文件解码出错记为该文件的错误；结束标记总会放入，调度循环不会卡住。
+    """
+    try:
+        for idx in order:
+            path = file_paths[idx]
+            try:
+                item = (idx, path) + transcriber.decode_input(path, use_vad)
+            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                item = (idx, path, None, None, f'解码失败：{e or type(e).__name__}', {})
+            jobs.put(item)
+    finally:
+        jobs.put(None)
+
+
+def _fail_remaining(jobs, finish, error):
+    """把解码队列里剩余的文件全部记为失败，直到结束标记。"""
+    while True:
+        item = jobs.get()
+        if item is None:
+            return
+        idx, path, _audio, _time_map, err, info = item
+        finish(idx, path, None, err or error, info)
+
+
+def _run_chunks(ex, file_paths, order, finish, workers, chunk_s, language, export_itt,
+                use_vad, cache, keys, formats=()):
+    import chunking
+
+    jobs = queue.Queue(maxsize=2)
+    threading.Thread(target=_decode_in_order, args=(file_paths, order, jobs, use_vad),
+                     daemon=True).start()
+    files = {}       # idx -> 未完成文件的分块与已返回结果
+    inflight = {}    # future -> (idx, chunk_index)
+    exhausted = False
+    while not exhausted or inflight:
+        # 在途分块不足 2×进程数时继续领取已解码文件（整文件一次性提交全部分块）
+        while not exhausted and len(inflight) < 2 * workers:
+            try:
+                item = jobs.get(block=not inflight)
+            except queue.Empty:
+                break
+            if item is None:
+                exhausted = True
+                break
+            idx, path, audio, time_map, err, info = item
+            if err is not None:
+                finish(idx, path, None, err, info)
+                continue
+            chunks = chunking.plan_chunks(audio, chunk_s=chunk_s)
+            info['chunks'] = len(chunks)
+            files[idx] = {'path': path, 'chunks': chunks, 'parts': [None] * len(chunks),
+                          'left': len(chunks), 'info': info, 'time_map': time_map,
+                          't0': time.perf_counter()}
+            try:
+                for ci, c in enumerate(chunks):
+                    inflight[ex.submit(_transcribe_chunk, audio[c.start:c.end])] = (idx, ci)
+            except BrokenProcessPool as e:
+                # 工作进程已崩溃（OOM 等）：当前文件与尚未提交的文件都记为失败，
+                # 在途分块随后各自报错
+                del files[idx]
+                finish(idx, path, None, f'工作进程失败：{e}', info)
+                _fail_remaining(jobs, finish, f'工作进程失败：{e}')
+                exhausted = True
+            del audio, item
+        if not inflight:
+            continue
+
+        done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+        for fut in done:
+            idx, ci = inflight.pop(fut)
+            f = files.get(idx)
+            if f is None:
+                continue  # 该文件已因其他分块失败而结束
+            try:
+                f['parts'][ci] = fut.result()
+            except Exception as e:  # noqa: BLE001 - 子进程崩溃（BrokenProcessPool 等）
+                del files[idx]
+                finish(idx, f['path'], None, f'工作进程失败：{e}', f['info'])
+                continue
+            f['left'] -= 1
+            if f['left']:
+                continue
+            del files[idx]
+            info = f['info']
+            t1 = time.perf_counter()
+            try:
+                res = chunking.stitch(f['chunks'], f['parts'])
+                if f['time_map'] is not None:
+                    f['time_map'].remap(res)
+                if not res['segments']:
+                    raise ValueError('未能生成有效的字幕分段')
+                info.update(transcribe_s=round(t1 - f['t0'], 3), language=res['language'],
+                            segments=len(res['segments']))
+                if cache is not None and keys[idx]:
+                    cache.put(keys[idx], res)
+                srt_path, itt_path = transcriber.write_outputs(
+                    f['path'], res, export_itt, language or res['language'], formats)
+                info.update(itt=itt_path, write_s=round(time.perf_counter() - t1, 3))
+                finish(idx, f['path'], srt_path, None, info)
+            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                finish(idx, f['path'], None, str(e), info)
+
+
+def run_pool(file_paths, wname, device, language, task, export_itt, workers,
+             threads=None, on_result=None, chunk_s=None, use_vad=False, cache=None, keys=None,
+             formats=()):
+    """用 workers 个进程转录 file_paths。
+
+    chunk_s 为正数时启用长文件切块并行（父进程解码切块、子进程转录、父进程拼接写出）；
+    否则每个文件整体作为一个任务。use_vad 时解码后先经 VAD 剔除静音（切块在紧凑音频上进行）。
+    cache（result_cache.ResultCache）与 keys（与 file_paths 对应的缓存键）给出时，
+    转录结果会写入缓存（子进程按同一目录与容量各自打开）。
+    formats 为 SRT / ITT 之外要一并写出的格式（见 subtitles.FORMATS）。
+    on_result(idx, path, srt_path, error, info) 按完成顺序在调用线程中回调。
+    返回 [(path, srt_path_or_None, error_or_None), ...]，顺序与输入一致。
+    """
+    total = len(file_paths)
+    workers = max(1, workers if chunk_s else min(workers, total))
+    threads = threads or split_threads(workers)
+    results = [None] * total
+    order = sorted(range(total), key=lambda i: _size_or_zero(file_paths[i]), reverse=True)
+    keys = keys or [None] * total
+    cache_conf = (cache.root, cache.max_bytes) if cache is not None else None
+
+    def finish(idx, path, srt_path, err, info):
+        results[idx] = (path, srt_path, err)
+        if on_result:
+            on_result(idx, path, srt_path, err, info)
+
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(wname, device, threads, language, task, export_itt, use_vad,
+                      cache_conf, tuple(formats))) as ex:
+        if chunk_s:
+            _run_chunks(ex, file_paths, order, finish, workers, chunk_s, language, export_itt,
+                        use_vad, cache, keys, formats)
+        else:
+            _run_files(ex, file_paths, order, finish, keys)
+    return results
@@ -0,0 +1,904 @@
+"""转录核心（不依赖 PyQt5）。
+
+GUI（main.py）与无界面批处理（batch_cli.py）共用这里的逻辑：
+- 支持格式 / 语言 / 模型注册表；
+- ffmpeg 注入、进度垫片、模型缓存、SRT 生成；
+- Transcriber：解码 → 转录 → 写出三段流水线，状态通过回调上报，
+  由调用方决定转成 Qt 信号还是打印 / 写清单。
+"""
+import os
+import sys
+import queue
+import shutil
+import platform
+import threading
+import time
+
+from pathlib import Path
+
+import weights
+import batch_decode
+import downloader
+import subtitles
+from model_cache import ModelCache
+from subtitles import Subtitles, format_timestamp  # noqa: F401 - format_timestamp 供 main 复用
+
+# 支持的音频与视频扩展名（基于 ffmpeg 常见可解码格式）
+SUPPORTED_AUDIO_EXTENSIONS = {
+    '.aac', '.aiff', '.alac', '.amr', '.flac', '.m4a', '.mp3',
+    '.ogg', '.opus', '.wav', '.wma',
+}
+SUPPORTED_VIDEO_EXTENSIONS = {
+    '.avi', '.flv', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg',
+    '.mpg', '.ts', '.webm', '.wmv',
+}
+SUPPORTED_EXTENSIONS = SUPPORTED_AUDIO_EXTENSIONS.union(SUPPORTED_VIDEO_EXTENSIONS)
+
+# 语言下拉项：(whisper 语言码或 None, 显示名)
+LANGUAGES = [
+    (None, '自动检测'),
+    ('zh', '中文'),
+    ('en', '英语'),
+    ('ja', '日语'),
+    ('ko', '韩语'),
+    ('yue', '粤语'),
+    ('es', '西班牙语'),
+    ('fr', '法语'),
+    ('de', '德语'),
+    ('ru', '俄语'),
+    ('it', '意大利语'),
+    ('pt', '葡萄牙语'),
+    ('ar', '阿拉伯语'),
+    ('hi', '印地语'),
+    ('th', '泰语'),
+    ('vi', '越南语'),
+]
+
+# 模型注册表：id, 显示名, MLX 仓库(Apple Silicon), whisper 名(其余平台), 约大小(MB)
+# 注意 turbo 系列仓库名不遵循 whisper-{size}-mlx 规则，需在此显式映射。
+MODELS = [
+    ('large-v3-turbo', '⚡ Large V3 Turbo（推荐 · 又快又准）',
+     'mlx-community/whisper-large-v3-turbo', 'large-v3-turbo', 1600),
+    ('large-v3', 'Large V3（最高准确度 · 较慢）',
+     'mlx-community/whisper-large-v3-mlx', 'large-v3', 3100),
+    ('medium', 'Medium（中型）',
+     'mlx-community/whisper-medium-mlx', 'medium', 1500),
+    ('small', 'Small（小型）',
+     'mlx-community/whisper-small-mlx', 'small', 480),
+    ('base', 'Base（基础）',
+     'mlx-community/whisper-base-mlx', 'base', 145),
+    ('tiny', 'Tiny（最快 · 准确度低）',
+     'mlx-community/whisper-tiny-mlx', 'tiny', 75),
+]
+
+_MODEL_BY_ID = {m[0]: m for m in MODELS}
+
+
+def model_mlx_repo(model_id):
+    return _MODEL_BY_ID[model_id][2]
+
+
+def model_whisper_name(model_id):
+    return _MODEL_BY_ID[model_id][3]
+
+
+def model_approx_mb(model_id):
+    return _MODEL_BY_ID[model_id][4]
+
+
+def is_apple_silicon():
+    return platform.system() == 'Darwin' and platform.machine() == 'arm64'
+
+
+# ----------------------------- ffmpeg 注入 -----------------------------
+
+_FFMPEG_PATH = None
+
+
+def setup_ffmpeg():
+    """把随包的 ffmpeg 暴露为 PATH 中名为 `ffmpeg` 的可执行文件。
+
+    imageio-ffmpeg 自带的二进制名形如 `ffmpeg-macos-arm64-vX`，而 whisper /
+    mlx_whisper 内部以 `ffmpeg` 调用子进程，故把它复制成一个名为 ffmpeg 的真实文件
+    放到稳定的缓存目录，并把该目录前置到 PATH。
+
+    用「复制」而非「软链」很关键：macOS 的 App Translocation 会让 .app 每次从不同
+    的随机临时路径运行，旧的软链会指向已消失的路径而失效，导致回退后 PATH 里只有名为
+    `ffmpeg-macos-...` 的二进制，whisper 以 `ffmpeg` 调用时报 “No such file”。复制出
+    的真实文件不受其影响；按大小判断复用，仅首次复制。
+    """
+    global _FFMPEG_PATH
+    src = None
+    try:
+        import imageio_ffmpeg
+        src = imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        src = None
+    if not src or not os.path.exists(src):
+        _FFMPEG_PATH = shutil.which('ffmpeg')
+        if _FFMPEG_PATH:
+            os.environ['PATH'] = (os.path.dirname(_FFMPEG_PATH) + os.pathsep
+                                  + os.environ.get('PATH', ''))
+        return _FFMPEG_PATH
+
+    bindir = os.path.join(os.path.expanduser('~/.cache/srtgen'), 'bin')
+    name = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg'
+    target = os.path.join(bindir, name)
+    try:
+        os.makedirs(bindir, exist_ok=True)
+        reuse = (os.path.isfile(target) and not os.path.islink(target)
+                 and os.path.getsize(target) == os.path.getsize(src))
+        if not reuse:
+            if os.path.islink(target) or os.path.exists(target):
+                try:
+                    os.remove(target)
+                except OSError:
+                    pass
+            shutil.copy2(src, target)
+            os.chmod(target, 0o755)
+        _FFMPEG_PATH = target
+        os.environ['PATH'] = bindir + os.pathsep + os.environ.get('PATH', '')
+    except Exception:
+        # 退路：直接用 imageio 二进制目录（名字可能不符，但聊胜于无）
+        _FFMPEG_PATH = src
+        os.environ['PATH'] = os.path.dirname(src) + os.pathsep + os.environ.get('PATH', '')
+    return _FFMPEG_PATH
+
+
+def have_ffmpeg():
+    return bool(_FFMPEG_PATH) or shutil.which('ffmpeg') is not None
+
+
+# ----------------------------- 进度补丁（尽力而为） -----------------------------
+
+class _ProgressReporter:
+    """承载当前转录的进度回调（单转录串行执行，全局即可）。"""
+    callback = None
+
+
+class _TqdmShim:
+    """替换 whisper/mlx_whisper.transcribe 内部 tqdm 的安全垫片。
+
+    支持 `tqdm(...)` 与 `tqdm.tqdm(...)` 两种调用形态，并对未知属性返回空操作，
+    确保即便上游内部结构有变化也不会破坏转录本身。
+    """
+
+    class _Bar:
+        def __init__(self, iterable=None, total=None, **kw):
+            self.iterable = iterable
+            self.total = total
+            self.n = 0
+
+        def update(self, k=1):
+            self.n += k
+            cb = _ProgressReporter.callback
+            if cb and self.total:
+                try:
+                    cb(max(0.0, min(1.0, self.n / float(self.total))))
+                except Exception:
+                    pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *a):
+            return False
+
+        def __iter__(self):
+            for obj in (self.iterable or []):
+                yield obj
+                self.update(1)
+
+        def __getattr__(self, _name):
+            return lambda *a, **k: None
+
+    # 同时支持 shim(...) 与 shim.tqdm(...)
+    tqdm = _Bar
+
+    def __call__(self, *a, **k):
+        return _TqdmShim._Bar(*a, **k)
+
+
+def _install_progress_patch(module_name):
+    """把指定 *.transcribe 模块的 tqdm 替换为垫片，返回还原函数。"""
+    mod = sys.modules.get(module_name + '.transcribe')
+    if mod is None or getattr(mod, 'tqdm', None) is None:
+        return lambda: None
+    original = mod.tqdm
+    mod.tqdm = _TqdmShim()
+
+    def restore():
+        mod.tqdm = original
+
+    return restore
+
+
+# ----------------------------- 模型缓存 -----------------------------
+
+# 进程内模型缓存（whisper 与 MLX 共用）：按设备类别的内存 / 显存预算做 LRU 淘汰
+MODEL_CACHE = ModelCache()
+
+# CPU 上的 int8 动态量化模式（whisper 后端）：更快、更省内存，准确度略降
+QUANTIZED = 'quantized'
+
+
+def _noop(*_a, **_k):
+    pass
+
+
+def _estimate_bytes(field, value, factor):
+    """按注册表的下载大小（fp16）估算加载后的占用；factor 为 fp32 时的倍数。"""
+    for m in MODELS:
+        if m[field] == value:
+            return int(m[4] * factor) << 20
+    return 0
+
+
+def _whisper_checkpoint(size):
+    """本地已下载的 {size}.pt 路径与（未在下载时校验过才需要的）期望 sha256。"""
+    pt = downloader.whisper_cache_path(size)
+    if not pt or not os.path.exists(pt):
+        return None, None
+    verified = downloader.verified_whisper_checkpoint(size) is not None
+    return pt, None if verified else downloader.whisper_sha256(size)
+
+
+def prepare_whisper_weights(size, device=None, on_status=_noop):
+    """多进程池启动前在父进程把已下载的检查点转换一次（quantized 时连同 int8 缓存）。
+
+    工作进程只映射转换结果、不再自行转换（见 _get_whisper_model 的 convert）。
+    """
+    pt, sha = _whisper_checkpoint(size)
+    if not pt:
+        return
+    try:
+        if device == QUANTIZED:
+            weights.load_quantized(pt, sha)
+        else:
+            weights.convert(pt, sha)
+    except Exception as e:  # noqa: BLE001 - 各进程加载时回退到 whisper.load_model
+        on_status(f'权重转换失败，改用常规加载：{e}')
+
+
+def _get_whisper_model(whisper, size, device, on_status=_noop, convert=True):
+    """device 为 'quantized' 时加载 CPU 上的 int8 动态量化模型（Linear 约为 fp32 的 1/4）。
+
+    convert=False 时只使用已转换好的权重（多进程池的工作进程），没有则常规加载。
+    """
+    if device == QUANTIZED:
+        return MODEL_CACHE.get(('whisper', size, device),
+                               lambda: _load_quantized_model(whisper, size, on_status, convert),
+                               device, estimate=_estimate_bytes(3, size, 1))
+    return MODEL_CACHE.get(('whisper', size, device),
+                           lambda: _load_whisper_model(whisper, size, device, on_status, convert),
+                           device, estimate=_estimate_bytes(3, size, 2))
+
+
+def _load_quantized_model(whisper, size, on_status=_noop, convert=True):
+    pt, sha = _whisper_checkpoint(size)
+    if pt:
+        # 量化结果缓存在磁盘上：只有第一次需要加载 fp32 再量化
+        try:
+            return weights.load_quantized(
+                pt, sha, allow_convert=convert,
+                load_fp32=lambda: _load_whisper_model(whisper, size, 'cpu', on_status, convert))
+        except FileNotFoundError:
+            pass
+    return weights.quantize(_load_whisper_model(whisper, size, 'cpu', on_status, convert))
+
+
+def _load_whisper_model(whisper, size, device, on_status=_noop, convert=True):
+    model = None
+    pt, sha = _whisper_checkpoint(size)
+    if pt:
+        # mmap 加载：参数直接引用映射页面，无反序列化 + 拷贝的双份峰值，多进程共享页缓存
+        try:
+            model = weights.load_model(pt, device, sha, allow_convert=convert)
+        except Exception as e:  # noqa: BLE001 - 回退到 whisper.load_model，但要说明原因
+            if not isinstance(e, FileNotFoundError):    # 未转换：父进程已报告过原因
+                on_status(f'mmap 加载失败，改用常规加载：{e}')
+            model = None
+    if model is None:
+        # 下载时已通过 sha256 校验的 .pt 按路径加载：跳过 load_model 对整个文件的重算
+        path = downloader.verified_whisper_checkpoint(size)
+        model = whisper.load_model(path or size, device=device)
+    heads = getattr(whisper, '_ALIGNMENT_HEADS', {}).get(size)
+    if heads is not None:
+        model.set_alignment_heads(heads)  # mmap / 按路径加载时 whisper 不会设置对齐头
+    return model
+
+
+# MLX：仓库 → 本地目录（每进程只解析一次）；已加载模型放在 MODEL_CACHE（跨多次「生成字幕」复用）
+_MLX_MODEL_DIRS = {}
+
+
+def _resolve_mlx_model(repo, endpoint=None, on_progress=None, on_start=None):
+    """解析 MLX 模型的本地目录：先查进程内记录，再做离线缓存检查，都没有才下载。
+
+    已缓存时不发任何网络请求；下载失败返回 repo id，交给 mlx_whisper 自行下载。
+    """
+    local = _MLX_MODEL_DIRS.get(repo)
+    if local and os.path.isdir(local):
+        return local
+    local = downloader.cached_mlx_model_dir(repo)
+    if local is None:
+        try:
+            local = downloader.ensure_mlx_model(
+                repo, on_progress=on_progress, on_start=on_start, endpoint=endpoint)
+        except Exception:
+            local = None
+    if not local:
+        return repo
+    _MLX_MODEL_DIRS[repo] = local
+    return local
+
+
+def _get_mlx_model(path):
+    """加载（或复用常驻的）MLX 模型，并设为 mlx_whisper 当前模型。
+
+    mlx_whisper.transcribe 内部的 ModelHolder 只记住最近一个模型、且按路径比较；
+    这里按路径把用过的模型留在 MODEL_CACHE（超出预算时淘汰最久未用的），每次转录前
+    把对应模型放回 ModelHolder，切换模型或再次点击生成都不必重新加载。
+    """
+    import importlib
+    import mlx.core as mx
+    from mlx_whisper.load_models import load_model
+    holder = importlib.import_module('mlx_whisper.transcribe').ModelHolder
+
+    def on_evict(model):
+        if holder.model is model:       # 否则 ModelHolder 仍持有引用，内存释放不掉
+            holder.model, holder.model_path = None, None
+
+    repo = next((r for r, d in _MLX_MODEL_DIRS.items() if d == path), path)
+    # dtype 与 transcribe 默认的 fp16 一致
+    model = MODEL_CACHE.get(('mlx', path), lambda: load_model(path, dtype=mx.float16), 'mlx',
+                            estimate=_estimate_bytes(2, repo, 1), on_evict=on_evict)
+    holder.model, holder.model_path = model, path
+    return model
+
+
+# ----------------------------- SRT 生成 -----------------------------
+
+def generate_srt(segments):
+    """whisper 风格分段（或 subtitles.Subtitles）→ SRT 文本。"""
+    if not isinstance(segments, Subtitles):
+        segments = Subtitles.from_segments(segments)
+    return subtitles.to_srt(segments)
+
+
+def write_outputs(path, res, export_itt, language, formats=()):
+    """把转录结果写到媒体文件旁：.srt，及可选 .itt 与 formats 中的其他格式。
+
+    各格式都由同一份内存中的 Subtitles 直接生成。返回 (srt_path, itt_path_or_None)。
+    """
+    subs = Subtitles.from_segments(res['segments'], language=language or 'zh')
+    wanted = ['srt'] + (['itt'] if export_itt else [])
+    wanted += [f for f in formats if f not in wanted]
+    paths = subtitles.write_all(subs, str(Path(path).with_suffix('')), wanted)
+    return paths['srt'], paths.get('itt')
+
+
+def check_input(path):
+    """转录前的输入检查：返回错误信息，可处理时返回 None。"""
+    if not os.path.exists(path):
+        return '文件不存在'
+    if Path(path).suffix.lower() not in SUPPORTED_EXTENSIONS:
+        return '不支持的文件格式'
+    return None
+
+
+# ----------------------------- 音频解码 -----------------------------
+
+SAMPLE_RATE = 16000
+
+# 流水线预取深度：解码线程最多领先转录几个文件（每个文件的 PCM 约 230 MB/小时）
+_PREFETCH_FILES = 2
+
+# 短音频（不超过一个 30 秒窗口）批量解码时每批的文件数（见 batch_decode）
+_BATCH_FILES = 8
+
+
+def _load_audio(path):
+    """解码为 16 kHz 单声道 float32 PCM（transcribe 可直接接收），使用随包 ffmpeg。
+
+    由 audio.load_audio 流式写入预分配缓冲，避免后端 load_audio 的多份整段拷贝；
+    同一数组随后供 VAD / 切块 / 推理共用，不重复解码。
+    """
+    import audio
+    return audio.load_audio(path, sr=SAMPLE_RATE, ffmpeg=_FFMPEG_PATH)
+
+
+def decode_input(path, use_vad=False):
+    """解码阶段：检查输入 → 解码为 PCM →（可选）VAD 剔除静音。
+
+    返回 (audio, time_map, error, info)。启用 VAD 时 audio 为只含语音的紧凑 PCM，
+    time_map 用于把转录结果映射回原时间轴（未启用为 None）；info 含各步耗时。
+    """
+    info = {}
+    audio = time_map = None
+    t0 = time.perf_counter()
+    err = check_input(path)
+    if err is None:
+        try:
+            audio = _load_audio(path)
+            info['audio_s'] = round(len(audio) / SAMPLE_RATE, 3)
+        except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+            err = f'音频解码失败：{e}'
+    info['decode_s'] = round(time.perf_counter() - t0, 3)
+    if audio is not None and use_vad:
+        import vad
+        t1 = time.perf_counter()
+        audio, time_map = vad.compact(audio, vad.detect_speech(audio))
+        info.update(speech_s=round(len(audio) / SAMPLE_RATE, 3),
+                    vad_s=round(time.perf_counter() - t1, 3))
+        if not len(audio):
+            audio, err = None, '未检测到语音'
+    return audio, time_map, err, info
+
+
+def import_backend():
+    """导入当前平台的转录后端，返回 (apple, backend_module)。"""
+    apple = is_apple_silicon()
+    if apple:
+        import mlx_whisper as backend
+    else:
+        import whisper as backend
+    return apple, backend
+
+
+def default_device():
+    """当前平台的默认设备：Apple Silicon 为 mlx，其余平台有 CUDA 用 cuda，否则 cpu。"""
+    if is_apple_silicon():
+        return 'mlx'
+    try:
+        import torch
+        return 'cuda' if torch.cuda.is_available() else 'cpu'
+    except Exception:
+        return 'cpu'
+
+
+# ----------------------------- 转录流水线 -----------------------------
+
+def _unfinished(file_paths, results):
+    """没有结果的文件（某阶段中途退出等）记为失败，不从返回的列表中丢掉。"""
+    return [r if r is not None else (path, None, '未完成')
+            for path, r in zip(file_paths, results)]
+
+
+class Transcriber:
+    """批量转录引擎：解码 → 转录 → 写出三段流水线。
+
+    回调（均可省略）：
+    - on_status(str)：状态文本；
+    - on_pct(int)：0..100 进度（下载或转录，可能不触发）；
+    - on_task(str)：阶段切换 downloading / loading / transcribing；
+    - on_file_done(dict)：单个文件完成（成功或失败），含路径、输出与各阶段耗时，
+      供批处理写清单。可能在写出线程中调用，引擎保证串行调用。
+
+    run(file_paths) 返回 [(path, srt_path_or_None, error_or_None), ...]，顺序与输入一致。
+    load_model() / transcribe(audio) 单独加载模型、转录一段 PCM（不缓存、不写出）。
+    workers > 1 且非 Apple Silicon、设备为 cpu / quantized 时，整批交给 transcribe_pool 多进程执行；
+    同时给出 chunk_seconds 时长文件会切块分给多个进程并行（见 chunking）。
+    给出 cache（result_cache.ResultCache）时，命中的文件跳过解码与推理直接写出；
+    整批全部命中时模型不会被加载。
+    batch_size > 1 且为 openai-whisper 时，不超过 30 秒的短音频每 batch_size 个
+    拼成一批一次解码（见 batch_decode），长文件仍逐个转录。批量贪心解码的结果与
+    完整 transcribe 可能略有差异，缓存中使用独立的条目；默认关闭。
+    """
+
+    def __init__(self, model_size, device, language, task, export_itt, endpoint=None,
+                 prefetch=_PREFETCH_FILES, workers=1, chunk_seconds=None, use_vad=False,
+                 cache=None, batch_size=1, formats=(), on_status=None, on_pct=None,
+                 on_task=None, on_file_done=None):
+        self.model_size = model_size
+        self.device = device
+        self.language = language        # None 表示自动检测
+        self.task = task                # 'transcribe' / 'translate'
+        self.export_itt = export_itt
+        self.formats = tuple(formats)   # 另外导出的格式（vtt / ass / ttml / json，见 subtitles）
+        self.endpoint = endpoint        # HF 下载端点（镜像）
+        self.prefetch = prefetch        # 解码阶段最多领先转录的文件数
+        self.workers = workers          # >1 且为 CPU 时改用多进程池（见 transcribe_pool）
+        self.chunk_seconds = chunk_seconds  # 多进程时把长文件切成约此长度的块并行转录
+        self.vad = use_vad              # 推理前用 VAD 剔除静音段（见 vad.py）
+        self.cache = cache              # result_cache.ResultCache；None 为不缓存
+        self.batch_size = batch_size    # >1 时短音频成批解码（仅 openai-whisper）
+        self.on_status = on_status or _noop
+        self.on_pct = on_pct or _noop
+        self.on_task = on_task or _noop
+        self.on_file_done = on_file_done or _noop
+        self._done_lock = threading.Lock()
+        self._last_dl_emit = 0.0
+        self._holder = {'model': None}  # load_model / transcribe 共用的常驻模型
+
+    def _emit_pct(self, fraction):
+        self.on_pct(int(fraction * 100))
+
+    def _on_download_start(self):
+        self.on_task('downloading')
+
+    def _on_download_progress(self, done, total, speed, conns=None):
+        """下载进度回调（节流到约 5 次/秒），显示百分比 + 速度 + 大小。"""
+        now = time.time()
+        if now - self._last_dl_emit < 0.2 and total and done < total:
+            return
+        self._last_dl_emit = now
+        mb = 1 << 20
+        pct = int(done / total * 100) if total else 0
+        self.on_pct(pct)
+        self.on_status(
+            f'下载模型 {pct}% · {speed / mb:.1f} MB/s · {done // mb}/{(total or done) // mb} MB'
+            + (f' · {sum(1 for c in conns if c["alive"])} 连接' if conns else ''))
+
+    def _report_model_load(self):
+        _, hit, load_s = MODEL_CACHE.last
+        self.on_status('复用已加载的模型' if hit else f'模型加载完成（{load_s:.1f}s）')
+
+    def _transcribe_one(self, backend, audio, apple, model_holder):
+        """转录单个文件（已解码的 PCM 或路径），返回 whisper 风格 result dict。"""
+        if apple:
+            repo = self._mlx_model(model_holder)
+            self.on_task('transcribing')
+            self.on_status('正在转录...')
+            self.on_pct(0)
+            restore = _install_progress_patch('mlx_whisper')
+            _ProgressReporter.callback = self._emit_pct
+            try:
+                return backend.transcribe(
+                    audio,
+                    path_or_hf_repo=repo,
+                    language=self.language,
+                    task=self.task,
+                    verbose=False,  # 启用内部 tqdm，供进度垫片捕获
+                )
+            finally:
+                _ProgressReporter.callback = None
+                restore()
+        else:
+            model = self._whisper_model(backend, model_holder)
+            self.on_task('transcribing')
+            self.on_status('正在转录...')
+            self.on_pct(0)
+            restore = _install_progress_patch('whisper')
+            _ProgressReporter.callback = self._emit_pct
+            try:
+                return model.transcribe(
+                    audio,
+                    language=self.language,
+                    task=self.task,
+                    verbose=False,
+                )
+            finally:
+                _ProgressReporter.callback = None
+                restore()
+
+    def _mlx_model(self, model_holder):
+        """MLX：每批只解析一次模型目录（已缓存时离线判断，不访问网络）并常驻加载，返回目录。"""
+        if model_holder.get('model') is None:
+            path = _resolve_mlx_model(
+                model_mlx_repo(self.model_size), endpoint=self.endpoint,
+                on_progress=self._on_download_progress,
+                on_start=self._on_download_start)
+            self.on_task('loading')
+            self.on_status('正在加载模型...')
+            _get_mlx_model(path)
+            self._report_model_load()
+            model_holder['model'] = path
+        else:
+            _get_mlx_model(model_holder['model'])  # 其他会话可能切换过 ModelHolder
+        return model_holder['model']
+
+    def _whisper_model(self, backend, model_holder):
+        """openai-whisper：首次调用时下载（如需）并加载模型，之后直接返回。"""
+        if model_holder.get('model') is None:
+            wname = model_whisper_name(self.model_size)
+            try:
+                downloader.ensure_whisper_model(
+                    wname,
+                    on_progress=self._on_download_progress,
+                    on_start=self._on_download_start)
+            except Exception:
+                pass  # 回退到 whisper.load_model 自带下载
+            self.on_task('loading')
+            self.on_status('正在加载模型...')
+            model_holder['model'] = _get_whisper_model(backend, wname, self.device,
+                                                       self.on_status)
+            self._report_model_load()
+        return model_holder['model']
+
+    def _transcribe_batch(self, backend, batch, model_holder, writes, results):
+        """批量解码一组短音频 [(idx, path, audio, time_map, info), ...]，逐个交给写出。"""
+        try:
+            model = self._whisper_model(backend, model_holder)
+        except Exception as e:  # noqa: BLE001 - 与逐个转录一致：记为各文件的错误
+            for idx, path, _, _, info in batch:
+                self._finish(results, idx, path, None, str(e), info)
+            return
+        self.on_task('transcribing')
+        t0 = time.perf_counter()
+        try:
+            outs = batch_decode.transcribe_batch(
+                model, [b[2] for b in batch], self.language, self.task)
+        except Exception:
+            outs = [None] * len(batch)  # 整批失败（如显存不足）：逐个回退
+        share = (time.perf_counter() - t0) / len(batch)
+        for (idx, path, audio, time_map, info), res in zip(batch, outs):
+            t1 = time.perf_counter()
+            try:
+                if res is None:  # 需要温度回退：走完整的 transcribe
+                    res = model.transcribe(audio, language=self.language, task=self.task,
+                                           verbose=None)
+                else:
+                    info['batch'] = len(batch)
+                    if info.get('cache_key'):   # 批量解码的结果存到独立的条目
+                        try:
+                            info['cache_key'] = self._cache_key(path, batched=True)
+                        except OSError:
+                            info['cache_key'] = None
+                self._deliver(writes, idx, path, res, time_map, info,
+                              share + time.perf_counter() - t1)
+            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                info['transcribe_s'] = round(share + time.perf_counter() - t1, 3)
+                self._finish(results, idx, path, None, str(e), info)
+
+    def _deliver(self, writes, idx, path, res, time_map, info, elapsed):
+        """校验转录结果、映射回原时间轴并交给写出线程；无有效分段时抛出 ValueError。"""
+        if time_map is not None and isinstance(res, dict):
+            time_map.remap(res)
+        segments = res.get('segments') if isinstance(res, dict) else None
+        if not segments:
+            raise ValueError('未能生成有效的字幕分段')
+        info.update(transcribe_s=round(elapsed, 3),
+                    language=res.get('language'), segments=len(segments))
+        writes.put((idx, path, res, info))
+
+    def _finish(self, results, idx, path, srt_path, error, info):
+        """登记单个文件的结果并回调 on_file_done（串行）。"""
+        results[idx] = (path, srt_path, error)
+        record = {'path': path, 'srt': srt_path, 'error': error}
+        record.update(info)
+        with self._done_lock:
+            self.on_file_done(record)
+
+    def _cache_key(self, path, batched=False):
+        """path 在当前转录参数下的缓存键；batched 为批量贪心解码（见 batch_decode）的结果。"""
+        import result_cache
+        # int8 量化与批量解码的结果都与完整 transcribe 略有差异，各自使用独立的条目
+        return result_cache.cache_key(path, self.model_size, self.language, self.task,
+                                      vad=self.vad,
+                                      chunk=self.chunk_seconds if self._chunked() else None,
+                                      quantized=self.device == QUANTIZED,
+                                      decode='batch' if batched else None)
+
+    def _pooled(self):
+        """是否走多进程池：仅限非 Apple Silicon 的 CPU（含 int8 量化）且 workers > 1。"""
+        return self.workers > 1 and self.device in ('cpu', QUANTIZED) and not is_apple_silicon()
+
+    def _chunked(self):
+        """chunk_seconds 是否真正生效（只有多进程池会切块），未生效时不参与缓存键。"""
+        return bool(self.chunk_seconds) and self._pooled()
+
+    def _lookup(self, path):
+        """查结果缓存，返回 (完整转录的 cache_key_or_None, cached_result_or_None)。
+
+        启用批量解码时，完整转录的条目未命中再查批量解码的条目。
+        """
+        if self.cache is None or check_input(path) is not None:
+            return None, None
+        try:
+            key = self._cache_key(path)
+            cached = self.cache.get(key)
+            if cached is None and self.batch_size > 1:
+                cached = self.cache.get(self._cache_key(path, batched=True))
+        except OSError:
+            return None, None
+        return key, cached
+
+    def _decode_stage(self, file_paths, jobs, writes, stop):
+        """解码线程：按顺序预解码后续文件为 PCM，放入有界队列（满则阻塞，限制内存）。
+
+        缓存命中的文件不解码，直接交给写出线程。单个文件解码出错（如超长文件做 VAD 时
+        MemoryError）记为该文件的错误；无论如何最后都会放入结束标记，转录线程不会卡住。
+        """
+        try:
+            for idx, path in enumerate(file_paths):
+                if stop.is_set():
+                    break
+                try:
+                    key, cached = self._lookup(path)
+                    if cached is not None:
+                        writes.put((idx, path, cached,
+                                    {'cached': True, 'language': cached['language'],
+                                     'segments': len(cached['segments'])}))
+                        continue
+                    item = (idx, path) + decode_input(path, self.vad)
+                except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                    err = f'解码失败：{e or type(e).__name__}'
+                    item, key = (idx, path, None, None, err, {}), None
+                if key:
+                    item[-1]['cache_key'] = key
+                jobs.put(item)
+        finally:
+            jobs.put(None)
+
+    def _write_stage(self, writes, results):
+        """写出线程：生成 SRT（及可选 ITT），不占用转录线程。"""
+        while True:
+            item = writes.get()
+            if item is None:
+                return
+            idx, path, res, info = item
+            t0 = time.perf_counter()
+            try:
+                if self.cache is not None and info.get('cache_key'):
+                    self.cache.put(info['cache_key'], res)
+                srt_path, itt_path = write_outputs(
+                    path, res, self.export_itt, self.language or info['language'],
+                    self.formats)
+                info.update(itt=itt_path, write_s=round(time.perf_counter() - t0, 3))
+                self._finish(results, idx, path, srt_path, None, info)
+            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                self._finish(results, idx, path, None, str(e), info)
+
+    def _run_pool(self, file_paths):
+        """多进程模式：父进程先查缓存、确保模型已下载（避免 K 个进程同时下载），再分发文件。"""
+        import transcribe_pool
+
+        total = len(file_paths)
+        results = [None] * total
+        done = [0]
+
+        def on_result(idx, path, srt_path, err, info):
+            done[0] += 1
+            self._finish(results, idx, path, srt_path, err, info)
+            self.on_task('transcribing')
+            self.on_status(f'已完成 {done[0]}/{total}')
+            self.on_pct(int(done[0] * 100 / total))
+
+        pending, keys = [], []
+        for idx, path in enumerate(file_paths):
+            key, cached = self._lookup(path)
+            if cached is None:
+                pending.append(idx)
+                keys.append(key)
+                continue
+            info = {'cached': True, 'language': cached['language'],
+                    'segments': len(cached['segments'])}
+            try:
+                srt_path, itt_path = write_outputs(
+                    path, cached, self.export_itt, self.language or cached['language'],
+                    self.formats)
+                info['itt'] = itt_path
+                on_result(idx, path, srt_path, None, info)
+            except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                on_result(idx, path, None, str(e), info)
+        if not pending:
+            return results
+
+        wname = model_whisper_name(self.model_size)
+        try:
+            downloader.ensure_whisper_model(
+                wname,
+                on_progress=self._on_download_progress,
+                on_start=self._on_download_start)
+        except Exception:
+            pass  # 回退到各进程内 whisper.load_model 自带下载
+        # 各进程映射同一份转换后的权重，共享页缓存；转换只在这里做一次
+        prepare_whisper_weights(wname, self.device, self.on_status)
+        workers = self.workers if self.chunk_seconds else min(self.workers, len(pending))
+        self.on_task('loading')
+        self.on_status(f'正在启动 {workers} 个转录进程...')
+
+        def on_pool_result(i, path, srt_path, err, info):
+            on_result(pending[i], path, srt_path, err, info)
+
+        transcribe_pool.run_pool(
+            [file_paths[i] for i in pending], wname, self.device, self.language, self.task,
+            self.export_itt, workers, on_result=on_pool_result, chunk_s=self.chunk_seconds,
+            use_vad=self.vad, cache=self.cache, keys=keys, formats=self.formats)
+        return _unfinished(file_paths, results)
+
+    @staticmethod
+    def _backend(backend):
+        """(apple, backend)：backend 为 None 时按平台自动导入（失败则抛出）。"""
+        if backend is None:
+            return import_backend()
+        return is_apple_silicon(), backend
+
+    def load_model(self, backend=None):
+        """下载（如需）并加载模型，返回加载耗时（秒，不含下载；已加载过为 0）。
+
+        与 transcribe 配合，供基准等需要把加载与推理分开计时的场景使用。
+        """
+        apple, backend = self._backend(backend)
+        if self._holder.get('model') is not None:
+            return 0.0
+        if apple:
+            self._mlx_model(self._holder)
+        else:
+            self._whisper_model(backend, self._holder)
+        _, hit, load_s = MODEL_CACHE.last
+        return 0.0 if hit else load_s
+
+    def transcribe(self, audio, backend=None):
+        """转录一段已解码的 16 kHz PCM（或文件路径），返回 whisper 风格 result dict。
+
+        不查结果缓存、不写出文件；模型未加载时先加载（见 load_model）。
+        """
+        apple, backend = self._backend(backend)
+        return self._transcribe_one(backend, audio, apple, self._holder)
+
+    def run(self, file_paths, backend=None):
+        """转录一批文件。backend 为 None 时按平台自动导入（失败则抛出）。"""
+        file_paths = list(file_paths)
+        apple, backend = self._backend(backend)
+        if self._pooled() and (len(file_paths) > 1 or self.chunk_seconds):
+            return self._run_pool(file_paths)
+
+        # 三段流水线：解码（预取 prefetch 个文件）→ 转录（本线程）→ 写出。
+        # 模型推理期间下一个文件已在解码，SRT/ITT 写出也不阻塞下一次推理。
+        total = len(file_paths)
+        results = [None] * total
+        model_holder = {'model': None}
+        jobs = queue.Queue(maxsize=max(1, self.prefetch))
+        writes = queue.Queue()
+        stop = threading.Event()
+        decoder = threading.Thread(target=self._decode_stage,
+                                   args=(file_paths, jobs, writes, stop), daemon=True)
+        writer = threading.Thread(target=self._write_stage, args=(writes, results), daemon=True)
+        decoder.start()
+        writer.start()
+
+        # 短音频攒够 batch_size 个再一次解码；长文件照常逐个转录
+        batching = self.batch_size > 1 and not apple and total > 1
+        batch = []
+        try:
+            done = 0
+            while True:
+                item = jobs.get()
+                if item is None:
+                    break
+                idx, path, audio, time_map, err, info = item
+                done += 1
+                if err is not None:
+                    self._finish(results, idx, path, None, err, info)
+                    continue
+
+                # 按原始时长判断：VAD 后才变短的长文件仍逐个转录
+                if batching and batch_decode.fits(audio, info.get('audio_s')):
+                    batch.append((idx, path, audio, time_map, info))
+                    if len(batch) >= self.batch_size:
+                        self.on_status(f'批量转录 {len(batch)} 个短音频（{done}/{total}）')
+                        self._transcribe_batch(backend, batch, model_holder, writes, results)
+                        self.on_pct(int(done / total * 100))
+                        batch = []
+                    del audio, item
+                    continue
+
+                if total > 1:
+                    self.on_status(f'处理中 {done}/{total}：{os.path.basename(path)}')
+
+                t0 = time.perf_counter()
+                try:
+                    res = self._transcribe_one(backend, audio, apple, model_holder)
+                    self._deliver(writes, idx, path, res, time_map, info,
+                                  time.perf_counter() - t0)
+                except Exception as e:  # noqa: BLE001 - 逐文件汇总错误
+                    info['transcribe_s'] = round(time.perf_counter() - t0, 3)
+                    self._finish(results, idx, path, None, str(e), info)
+                del audio, item  # 尽早释放 PCM，避免与预取队列叠加占用内存
+            if batch:
+                self.on_status(f'批量转录 {len(batch)} 个短音频（{done}/{total}）')
+                self._transcribe_batch(backend, batch, model_holder, writes, results)
+        finally:
+            stop.set()
+            # 解码线程可能正阻塞在满队列上：排空以便其退出
+            while decoder.is_alive():
+                try:
+                    jobs.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            writes.put(None)
+            writer.join()
+
+        return _unfinished(file_paths, results)
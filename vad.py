@@ -0,0 +1,142 @@
+"""语音活动检测（VAD）预处理：推理前剔除静音 / 纯音乐段。
+
+纯 NumPy 的能量 + 谱通量检测，不需要网络与 GPU：
+
+- detect_speech：按 20 ms 帧计算对数能量与谱通量，以噪声底（能量低分位数）为基准
+  自适应定阈，再做拖尾保持、去短段、合并短间隙，返回语音区间（采样）；
+- compact：把语音区间（前后各留 pad）拼接成一段紧凑 PCM 交给后端转录，
+  同时返回 TimeMap，用于把结果时间戳映射回原时间轴。
+
+whisper 在长静音上会白跑解码、还可能「幻听」出文字；典型录音 30–50% 为静音，
+推理时间大致按比例下降。
+"""
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+_FRAME_S = 0.02         # 帧长 20 ms
+_BLOCK_FRAMES = 8192    # 分块计算频谱，限制长音频的临时内存
+_FLOOR_PCT = 10         # 噪声底：能量第 10 百分位
+_ENERGY_DB = 9.0        # 高于噪声底多少 dB 判为语音
+_FLUX_DB = 4.0          # 较弱帧若谱通量突出，高于噪声底此值也判为语音
+_HANGOVER_S = 0.2       # 语音帧后的拖尾保持
+_MIN_SPEECH_S = 0.25    # 短于此的语音段视为噪声脉冲丢弃
+_MERGE_GAP_S = 0.5      # 间隙短于此的相邻语音段合并
+
+
+def _frame_features(audio, frame):
+    """返回每帧的对数能量（dB）与归一化谱通量。"""
+    n = len(audio) // frame
+    energy = np.empty(n, dtype=np.float32)
+    flux = np.zeros(n, dtype=np.float32)
+    window = np.hanning(frame).astype(np.float32)
+    prev = None
+    for b in range(0, n, _BLOCK_FRAMES):
+        e = min(n, b + _BLOCK_FRAMES)
+        frames = audio[b * frame:e * frame].reshape(e - b, frame)
+        energy[b:e] = 10.0 * np.log10(np.mean(np.square(frames), axis=1) + 1e-10)
+        mag = np.abs(np.fft.rfft(frames * window, axis=1))
+        mag /= np.sum(mag, axis=1, keepdims=True) + 1e-10
+        if prev is not None:
+            mag_prev = np.vstack([prev, mag[:-1]])
+        else:
+            mag_prev = np.vstack([mag[:1], mag[:-1]])
+        flux[b:e] = np.sum(np.maximum(mag - mag_prev, 0.0), axis=1)
+        prev = mag[-1:]
+    return energy, flux
+
+
+def _runs(mask):
+    """布尔序列中连续 True 的 [start, end) 帧区间。"""
+    if not mask.any():
+        return []
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+def detect_speech(audio, sr=SAMPLE_RATE):
+    """返回语音区间 [(start_sample, end_sample), ...]（已合并、未加 padding）。"""
+    frame = int(_FRAME_S * sr)
+    if len(audio) < frame:
+        return []
+    energy, flux = _frame_features(audio, frame)
+    floor = float(np.percentile(energy, _FLOOR_PCT))
+    flux_thr = float(np.median(flux) + 2.0 * np.std(flux))
+    speech = (energy > floor + _ENERGY_DB) | ((energy > floor + _FLUX_DB) & (flux > flux_thr))
+
+    # 拖尾保持：语音帧之后 hangover 帧内仍视为语音（句尾弱辅音）
+    hang = int(_HANGOVER_S / _FRAME_S)
+    if hang > 0 and speech.any():
+        idx = np.flatnonzero(speech)
+        held = np.zeros_like(speech)
+        for off in range(hang + 1):
+            held[np.minimum(idx + off, len(speech) - 1)] = True
+        speech = held
+
+    min_len = int(_MIN_SPEECH_S / _FRAME_S)
+    gap = int(_MERGE_GAP_S / _FRAME_S)
+    regions = []
+    for s, e in _runs(speech):
+        if e - s < min_len:
+            continue
+        if regions and s - regions[-1][1] <= gap:
+            regions[-1][1] = e
+        else:
+            regions.append([s, e])
+    return [(s * frame, min(len(audio), e * frame)) for s, e in regions]
+
+
+class TimeMap:
+    """紧凑音频时间 → 原时间轴的分段线性映射。"""
+
+    __slots__ = ('compact_starts', 'orig_starts', 'lengths', 'sr')
+
+    def __init__(self, spans, sr=SAMPLE_RATE):
+        # spans：[(orig_start, orig_end), ...]（采样，升序且不重叠）
+        self.sr = sr
+        self.compact_starts, self.orig_starts, self.lengths = [], [], []
+        pos = 0
+        for s, e in spans:
+            self.compact_starts.append(pos / sr)
+            self.orig_starts.append(s / sr)
+            self.lengths.append((e - s) / sr)
+            pos += e - s
+
+    def to_original(self, t, is_end=False):
+        """把紧凑时间 t（秒）映射回原时间；is_end 时边界点归属前一段。"""
+        if not self.compact_starts:
+            return t
+        find = bisect_left if is_end else bisect_right
+        i = max(0, find(self.compact_starts, t) - 1)
+        return self.orig_starts[i] + min(max(t - self.compact_starts[i], 0.0), self.lengths[i])
+
+    def remap(self, res):
+        """原地把 whisper 风格 result 的分段（及逐词）时间映射回原时间轴，返回 res。"""
+        for seg in res.get('segments') or []:
+            seg['start'] = self.to_original(float(seg['start']))
+            seg['end'] = self.to_original(float(seg['end']), is_end=True)
+            for w in seg.get('words') or []:
+                w['start'] = self.to_original(float(w['start']))
+                w['end'] = self.to_original(float(w['end']), is_end=True)
+        return res
+
+
+def compact(audio, regions, pad_s=0.3, sr=SAMPLE_RATE):
+    """按语音区间（前后各加 pad_s）裁出紧凑 PCM，返回 (audio, TimeMap)。
+
+    无语音时返回空数组；加 padding 后重叠的区间会先合并。
+    """
+    pad = int(pad_s * sr)
+    spans = []
+    for s, e in regions:
+        s, e = max(0, s - pad), min(len(audio), e + pad)
+        if spans and s <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], e)
+        else:
+            spans.append([s, e])
+    if not spans:
+        return np.zeros(0, dtype=np.float32), TimeMap([], sr)
+    out = np.concatenate([audio[s:e] for s, e in spans]).astype(np.float32, copy=False)
+    return out, TimeMap(spans, sr)
@@ -0,0 +1,268 @@
+"""whisper 权重的内存映射（mmap）加载。
+
+whisper.load_model 会把整个 .pt 反序列化进内存，再按 fp32 模型逐个参数拷贝一遍，
+large-v3 加载时内存峰值约为模型的两倍；多进程转录池里每个进程各自一份。这里改为：
+
+- convert：首次使用时把缓存的检查点一次性转成 fp32、zip 格式的检查点
+  （~/.cache/srtgen/weights），之后不再转换；
+- load_model：torch.load(mmap=True) 直接映射该文件，在 meta 设备上构建模型结构，
+  再 load_state_dict(assign=True) 让参数直接引用映射的页面，无中间拷贝。
+  多个工作进程映射同一文件时共享页缓存，常驻内存只算一份。
+
+转换后的文件是 fp32（whisper 在 CPU 上本就以 fp32 推理），体积约为原 .pt 的两倍
+（large-v3 约多占 6 GB 磁盘）。转换前核对剩余空间，不足 _FREE_MARGIN 倍时不转换，
+由调用方回退到 whisper.load_model；副本随「删除缓存」一并删除（见 derived_paths）。
+
+load_quantized：CPU 的 int8 动态量化模式（device='quantized'）。把所有 Linear 层做
+动态 int8 量化，量化后的 state_dict 缓存到磁盘（weights_only 可加载，不 pickle 模块），
+之后启动按 dims 重建量化结构再载入，不再重复量化。
+
+缓存文件的标记（.json）记录源 .pt 的大小 / mtime 以及 torch、whisper 的版本，
+任一变化即重新转换。
+
+任何失败都应由调用方捕获并回退到 whisper.load_model。
+"""
+import os
+import json
+import hashlib
+import shutil
+
+_ROOT = os.path.join(os.path.expanduser('~/.cache/srtgen'), 'weights')
+_FORMAT = 1                 # 转换格式版本：变更后旧文件自然失效
+_HASH_BLOCK = 8 << 20
+_FREE_MARGIN = 1.2          # 转换所需空间（约为源 .pt 的两倍）之外再留的余量倍数
+
+
+def mmap_path(pt_path):
+    """pt_path 对应的可映射检查点路径。"""
+    name = os.path.splitext(os.path.basename(pt_path))[0]
+    return os.path.join(_ROOT, f'{name}.fp32.v{_FORMAT}.pt')
+
+
+def quantized_path(pt_path):
+    """pt_path 对应的 int8 量化模块缓存路径。"""
+    name = os.path.splitext(os.path.basename(pt_path))[0]
+    return os.path.join(_ROOT, f'{name}.int8.v{_FORMAT}.pt')
+
+
+def derived_paths(pt_path):
+    """由 pt_path 生成的全部缓存文件（fp32 映射、int8 量化及各自的标记），不论是否存在。"""
+    return [p for dest in (mmap_path(pt_path), quantized_path(pt_path))
+            for p in (dest, dest + '.json')]
+
+
+def _stamp(pt_path):
+    st = os.stat(pt_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _versions():
+    """影响缓存文件能否正确加载的库版本。"""
+    from importlib import metadata
+    found = {}
+    for dist in ('torch', 'openai-whisper'):
+        try:
+            found[dist] = metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            found[dist] = None
+    return found
+
+
+def _is_current(dest, pt_path):
+    """dest 存在，且由当前的 pt_path（大小与 mtime 一致）在当前库版本下转换而来。"""
+    try:
+        with open(dest + '.json', 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+        return (stamp.get('source') == _stamp(pt_path) and stamp.get('versions') == _versions()
+                and os.path.exists(dest))
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def _discard(dest):
+    for p in (dest, dest + '.json'):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def convert(pt_path, sha256=None, allow=True):
+    """把 whisper 检查点转成可 mmap 的 fp32 检查点，返回其路径（已是最新则直接返回）。
+
+    sha256 给出时先核对源文件（未经下载时校验的旧缓存只在转换这一次整读哈希），
+    不符抛出 ValueError；磁盘剩余空间不足时抛出 OSError。allow=False 时只接受已有
+    的转换结果（多进程池的工作进程：转换由父进程做一次），没有则抛出 FileNotFoundError。
+    """
+    dest = mmap_path(pt_path)
+    if _is_current(dest, pt_path):
+        return dest
+    if not allow:
+        raise FileNotFoundError(f'尚未转换：{os.path.basename(pt_path)}')
+    os.makedirs(_ROOT, exist_ok=True)
+    need = 2 * os.path.getsize(pt_path) * _FREE_MARGIN
+    if shutil.disk_usage(_ROOT).free < need:
+        raise OSError(f'磁盘空间不足，需要约 {need / (1 << 30):.1f} GB 才能转换权重')
+    if sha256 and _sha256(pt_path) != sha256.lower():
+        raise ValueError(f'sha256 校验失败：{os.path.basename(pt_path)}')
+
+    import torch
+    ckpt = torch.load(pt_path, map_location='cpu')
+    state = {k: v.float().contiguous() for k, v in ckpt['model_state_dict'].items()}
+    del ckpt['model_state_dict']
+    tmp = f'{dest}.{os.getpid()}.tmp'
+    try:
+        torch.save({'dims': ckpt['dims'], 'model_state_dict': state}, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _write_stamp(dest, pt_path)
+    return dest
+
+
+def _write_stamp(dest, pt_path):
+    with open(dest + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'source': _stamp(pt_path), 'from': os.path.basename(pt_path),
+                   'versions': _versions()}, f)
+
+
+def _materialize_buffers(model, dims):
+    """meta 上构建后仍为 meta 的非持久缓冲（不在 state_dict 中）按 whisper 的定义补建。"""
+    import torch
+    for name, buf in list(model.named_buffers()):
+        if not buf.is_meta:
+            continue
+        if name == 'decoder.mask':
+            n = buf.shape[0]
+            model.decoder.mask = torch.empty(n, n).fill_(float('-inf')).triu_(1)
+        elif name == 'alignment_heads':
+            heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            heads[dims.n_text_layer // 2:] = True
+            model.register_buffer('alignment_heads', heads.to_sparse(), persistent=False)
+        else:
+            raise RuntimeError(f'无法补建的缓冲：{name}')
+
+
+def _skeleton(dims):
+    """待 load_state_dict(assign=True) 填充的 Whisper 结构。
+
+    优先在 meta 设备上构建（不分配参数）；Whisper.__init__ 对 alignment_heads 调用的
+    to_sparse 并非每个 torch 版本都支持 meta 张量，失败时退回在 CPU 上构建（多一次
+    随机初始化，参数随后被映射的权重替换）。
+    """
+    import torch
+    from whisper.model import Whisper
+    try:
+        with torch.device('meta'):
+            return Whisper(dims)
+    except (NotImplementedError, RuntimeError):
+        return Whisper(dims)
+
+
+def load_model(pt_path, device, sha256=None, allow_convert=True):
+    """以 mmap 方式加载 whisper 模型（必要时先转换），返回已在 device 上的模型。"""
+    import torch
+    from whisper.model import ModelDimensions
+
+    path = convert(pt_path, sha256, allow_convert)
+    ckpt = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    dims = ModelDimensions(**ckpt['dims'])
+    model = _skeleton(dims)
+    model.load_state_dict(ckpt['model_state_dict'], assign=True)
+    _materialize_buffers(model, dims)
+    return model.to(device)
+
+
+def quantize(model):
+    """对 whisper 模型的 Linear 层做动态 int8 量化（仅 CPU），返回量化后的模型。
+
+    whisper 的 Linear 是 nn.Linear 的子类（只多了按输入 dtype 转换权重），而
+    quantize_dynamic 按确切类型匹配，先把它们换回 nn.Linear 才会被量化。
+    词嵌入（输出投影复用）与卷积前端保持 fp32。
+    """
+    import torch
+    _plain_linears(model)
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear},
+                                                  dtype=torch.qint8)
+
+
+def _plain_linears(model):
+    import torch
+    for m in model.modules():
+        if isinstance(m, torch.nn.Linear) and type(m) is not torch.nn.Linear:
+            m.__class__ = torch.nn.Linear
+
+
+def _quantized_skeleton(dims):
+    """按 dims 构建与 quantize 结果同结构的空模型，等待 load_state_dict 填充。
+
+    fp32 部分在 meta 上，Linear 换成空的动态量化 Linear（int8，约为 fp32 的 1/4）。
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as QLinear
+
+    model = _skeleton(dims)
+    _plain_linears(model)
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is torch.nn.Linear:
+                setattr(parent, name, QLinear(child.in_features, child.out_features,
+                                              bias_=child.bias is not None,
+                                              dtype=torch.qint8))
+    return model
+
+
+def _load_quantized_cache(dest):
+    import torch
+    from whisper.model import ModelDimensions
+
+    ckpt = torch.load(dest, map_location='cpu', weights_only=True)
+    dims = ModelDimensions(**ckpt['dims'])
+    model = _quantized_skeleton(dims)
+    model.load_state_dict(ckpt['model_state_dict'], assign=True)
+    _materialize_buffers(model, dims)
+    return model
+
+
+def load_quantized(pt_path, sha256=None, load_fp32=None, allow_convert=True):
+    """加载 int8 量化模型：有最新的磁盘缓存直接加载，否则加载 fp32、量化后写缓存。
+
+    load_fp32() 返回 fp32 模型（缺省走 load_model 的 mmap 路径）。缓存无法加载
+    （库升级后格式不兼容、文件损坏等）时删除并重新量化。int8 缓存约为 fp32 的 1/4。
+    allow_convert=False 时不量化、不写缓存，没有可用缓存则抛出 FileNotFoundError。
+    """
+    import dataclasses
+    import torch
+    dest = quantized_path(pt_path)
+    if _is_current(dest, pt_path):
+        try:
+            return _load_quantized_cache(dest)
+        except Exception:
+            _discard(dest)
+    if not allow_convert:
+        raise FileNotFoundError(f'尚未量化：{os.path.basename(pt_path)}')
+    model = load_fp32() if load_fp32 else load_model(pt_path, 'cpu', sha256)
+    model = quantize(model)
+    os.makedirs(_ROOT, exist_ok=True)
+    tmp = f'{dest}.{os.getpid()}.tmp'
+    try:
+        # 只存张量与 dims：weights_only 即可加载，不依赖 pickle 时的类定义
+        torch.save({'dims': dataclasses.asdict(model.dims),
+                    'model_state_dict': model.state_dict()}, tmp)
+        os.replace(tmp, dest)
+        _write_stamp(dest, pt_path)
+    except OSError:
+        pass                            # 写缓存失败不影响本次使用
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return model